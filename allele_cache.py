@@ -0,0 +1,156 @@
+# panssrator/allele_cache.py
+import os
+import gzip
+import json
+import hashlib
+from bisect import bisect_right
+from collections import Counter
+from typing import List, Dict, Optional
+from panssrator import config, utils, backends, genotyper
+
+SIDECAR_VERSION = 2
+
+def marker_key(marker: dict) -> str:
+    """Return the key identifying a marker inside a sidecar file (chrom:start-end:motif)."""
+    return f"{marker['chrom']}:{marker['start']}-{marker['end']}:{marker['motif']}"
+
+def marker_set_hash(markers: List[dict]) -> str:
+    """
+    Hash a marker set so sidecars extracted for one set are never reused for another.
+    The hash is independent of marker order.
+    """
+    digest = hashlib.sha1()
+    for key in sorted(marker_key(m) for m in markers):
+        digest.update(key.encode())
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+def sidecar_path(cache_dir: str, bam_file: str, marker_hash: str) -> str:
+    """Return the sidecar file path for a BAM file and marker set."""
+    sample = os.path.splitext(os.path.basename(bam_file))[0]
+    return os.path.join(cache_dir, f"{sample}.{marker_hash[:12]}{config.SIDECAR_SUFFIX}")
+
+def find_sidecars(cache_dir: str, marker_hash: str) -> List[str]:
+    """List the sidecar files in cache_dir that were extracted for the given marker set."""
+    suffix = f".{marker_hash[:12]}{config.SIDECAR_SUFFIX}"
+    return sorted(os.path.join(cache_dir, f) for f in os.listdir(cache_dir) if f.endswith(suffix))
+
+@utils.timeit
+def extract_sidecar(bam_file: str, markers: List[dict], cache_dir: str,
+                    marker_hash: Optional[str] = None) -> str:
+    """
+    Read a BAM file once and write a per-sample sidecar holding, for each marker,
+    the spanning-read repeat-length histogram broken down by MAPQ bin and strand.
+
+    Each histogram is stored as a list of [mapq_bin, strand, repeat_count, reads] rows,
+    where mapq_bin indexes config.SIDECAR_MAPQ_BINS. Markers on contigs the BAM has no
+    reference for (e.g. contigs of other genomes in a pan-genome marker table) are left
+    out; marker_hash still covers the full marker set. Returns the sidecar path.
+    """
+    if marker_hash is None:
+        marker_hash = marker_set_hash(markers)
+    # Taken before reading, so a BAM replaced mid-extraction is detected as changed.
+    stat = os.stat(bam_file)
+    bins = config.SIDECAR_MAPQ_BINS
+    histograms = {}
+    bam = backends.load("pysam").AlignmentFile(bam_file, "rb")
+    references = set(bam.references)
+    for marker in markers:
+        if marker["chrom"] not in references:
+            continue
+        counts = Counter()
+        for mapq, strand, repeat_count in genotyper.iter_repeat_observations(bam, marker):
+            counts[(bisect_right(bins, mapq) - 1, strand, repeat_count)] += 1
+        # Rows keep first-seen read order so tie-breaking between equally supported alleles
+        # matches genotyper.genotype_marker.
+        histograms[marker_key(marker)] = [[b, s, r, n] for (b, s, r), n in counts.items()]
+    bam.close()
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = sidecar_path(cache_dir, bam_file, marker_hash)
+    sidecar = {
+        "version": SIDECAR_VERSION,
+        "marker_set": marker_hash,
+        "bam": bam_file,
+        "bam_size": stat.st_size,
+        "bam_mtime": stat.st_mtime,
+        "mapq_bins": bins,
+        "markers": histograms,
+    }
+    # Write to a temporary file first so an interrupted run never leaves a truncated sidecar.
+    tmp_path = path + ".tmp"
+    with gzip.open(tmp_path, "wt") as f:
+        json.dump(sidecar, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+    utils.logger.info("Allele sidecar for %s saved to %s", bam_file, path)
+    return path
+
+def load_sidecar(path: str, marker_hash: Optional[str] = None) -> Optional[dict]:
+    """
+    Load a sidecar file. Returns None if it was written by another sidecar version
+    or, when marker_hash is given, for a different marker set.
+    """
+    with gzip.open(path, "rt") as f:
+        sidecar = json.load(f)
+    if sidecar.get("version") != SIDECAR_VERSION:
+        utils.logger.warning("Ignoring sidecar %s with unsupported version %s", path, sidecar.get("version"))
+        return None
+    if marker_hash is not None and sidecar.get("marker_set") != marker_hash:
+        utils.logger.warning("Ignoring sidecar %s extracted for a different marker set", path)
+        return None
+    return sidecar
+
+def sidecar_is_current(sidecar: dict, bam_file: str) -> bool:
+    """Return True if bam_file still has the size and mtime it had when the sidecar was extracted."""
+    stat = os.stat(bam_file)
+    return sidecar.get("bam_size") == stat.st_size and sidecar.get("bam_mtime") == stat.st_mtime
+
+def _min_mapq_bin(bins: List[int]) -> int:
+    """Return the index of the first MAPQ bin passing config.MIN_MAPQ."""
+    idx = bisect_right(bins, config.MIN_MAPQ) - 1
+    if bins[idx] != config.MIN_MAPQ:
+        # MIN_MAPQ falls inside a bin; round up to the next edge so no read below MIN_MAPQ is counted.
+        idx += 1
+        utils.logger.warning("MIN_MAPQ=%d is not a sidecar MAPQ bin edge %s; using reads with MAPQ >= %s",
+                             config.MIN_MAPQ, bins, bins[idx] if idx < len(bins) else "none")
+    return idx
+
+def genotype_sidecar(sidecar: dict, markers: List[dict]) -> Dict[int, dict]:
+    """
+    Call genotypes for markers from a loaded sidecar, applying the current
+    config.MIN_MAPQ and config.MIN_READ_SUPPORT.
+
+    Returns a dictionary mapping marker start to the genotyper.call_genotype result.
+    """
+    min_bin = _min_mapq_bin(sidecar["mapq_bins"])
+    calls = {}
+    for marker in markers:
+        allele_counts = Counter()
+        for mapq_bin, _strand, repeat_count, reads in sidecar["markers"].get(marker_key(marker), []):
+            if mapq_bin >= min_bin:
+                allele_counts[repeat_count] += reads
+        calls[marker["start"]] = genotyper.call_genotype(allele_counts)
+    return calls
+
+if __name__ == '__main__':
+    # Regression check on synthetic data: sidecar-based genotyping must give the same calls
+    # as plain genotype mode, also when the marker table has markers on contigs the BAMs lack.
+    import tempfile
+    from panssrator import io_tools, synthetic_data
+    from panssrator import main as pipeline
+    work_dir = tempfile.mkdtemp(prefix="panssr_sidecar_")
+    data = synthetic_data.generate_pangenome(work_dir, n_genomes=1, genome_size=100_000)
+    genome = next(iter(data["genomes"].values()))
+    bam_dir = os.path.join(work_dir, "bams")
+    synthetic_data.simulate_bams(bam_dir, dict(io_tools.read_fasta(genome["fasta"])), genome["ssrs"])
+    markers_file = os.path.join(work_dir, "markers.tsv")
+    foreign = dict(genome["ssrs"][0], chrom="scaffold_X")
+    synthetic_data.write_markers(markers_file, genome["ssrs"] + [foreign])
+    outputs = []
+    for cache_dir in (None, os.path.join(work_dir, "sidecars")):
+        outputs.append(os.path.join(work_dir, "plain.csv" if cache_dir is None else "cached.csv"))
+        pipeline.genotype_mode(genome["fasta"], markers_file, bam_dir, outputs[-1], cache_dir=cache_dir)
+    with open(outputs[0]) as plain, open(outputs[1]) as cached:
+        if plain.read() != cached.read():
+            utils.do_error(f"Sidecar genotype calls differ from plain genotype mode (see {work_dir})")
+    utils.logger.info("Sidecar and plain genotype calls match (%s)", work_dir)
@@ -1,15 +1,18 @@
 # panssrator/annotator.py
 import os
-from typing import List, Dict, Optional
-from intervaltree import Interval, IntervalTree
-from panssrator import utils
+from typing import List, Dict, Optional, TYPE_CHECKING
+from panssrator import utils, backends
 
-def load_annotation(annotation_file: str) -> Dict[str, IntervalTree]:
+if TYPE_CHECKING:
+    from intervaltree import IntervalTree
+
+def load_annotation(annotation_file: str) -> Dict[str, "IntervalTree"]:
     """
     Load a GFF/GTF file and return a dictionary mapping chromosomes to an IntervalTree of features.
     
     Each feature is stored as a dictionary with keys: 'type', 'start', 'end', 'strand', 'attributes'.
     """
+    IntervalTree = backends.load("intervaltree").IntervalTree
     trees = {}
     with open(annotation_file, "r") as f:
         for line in f:
@@ -32,7 +35,7 @@ def load_annotation(annotation_file: str) -> Dict[str, IntervalTree]:
             trees[chrom][start:end+1] = feature  # end+1 because intervaltree is half-open [start, end)
     return trees
 
-def annotate_ssr(ssr_record: dict, annot_trees: Dict[str, IntervalTree]) -> Optional[dict]:
+def annotate_ssr(ssr_record: dict, annot_trees: Dict[str, "IntervalTree"]) -> Optional[dict]:
     """
     Given an SSR record and annotation interval trees, find the first overlapping feature.
     Returns the feature dictionary if found; otherwise, None.
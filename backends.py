@@ -0,0 +1,37 @@
+# panssrator/backends.py
+import importlib
+import importlib.util
+from panssrator import utils
+
+# Heavy third-party engines, imported only when a code path actually needs them,
+# so e.g. genotype mode never pays for (or dies on) tre or primer3.
+# Engine name -> (module to import, install hint)
+ENGINES = {
+    "pysam": ("pysam", "conda install -c bioconda pysam"),
+    "primer3": ("primer3", "conda install -c bioconda primer3"),
+    "intervaltree": ("intervaltree", "conda install -c bioconda intervaltree"),
+    "numpy": ("numpy", "conda install -c conda-forge numpy"),
+    "tre": ("tre", "see https://github.com/laurikari/tre/"),
+}
+
+_loaded = {}
+
+def is_available(engine: str) -> bool:
+    """Return True if the engine can be imported, without importing it."""
+    if engine in _loaded:
+        return True
+    return importlib.util.find_spec(ENGINES[engine][0]) is not None
+
+def load(engine: str):
+    """Import an engine on first use and return the module; exit with an install hint if it is missing."""
+    if engine not in _loaded:
+        module, hint = ENGINES[engine]
+        try:
+            _loaded[engine] = importlib.import_module(module)
+        except ImportError:
+            utils.do_error(f"The '{module}' module is required for this mode. Please install it ({hint}).")
+    return _loaded[engine]
+
+if __name__ == '__main__':
+    for name in ENGINES:
+        utils.logger.info("%s: %s", name, "available" if is_available(name) else "missing")
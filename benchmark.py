@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+PanSSRAtor benchmark suite.
+
+Times every pipeline stage on deterministic synthetic data (see synthetic_data.py) at
+several genome sizes and writes throughput, peak memory, scaling exponents and, for
+genotyping, concordance with the simulated alleles to JSON.
+Stages whose engine (intervaltree, primer3, tre/numpy, pysam) is not installed are
+recorded as skipped.
+
+Usage:
+  python benchmark.py --scales 0.1,0.3,1 --output bench.json
+  python benchmark.py --scales 0.1,0.3,1 --output bench_new.json --compare bench.json
+  python benchmark.py --scales 0.1 --stages main_import --output startup.json
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import logging
+import subprocess
+import platform
+import argparse
+import tempfile
+import tracemalloc
+from typing import List, Dict, Any, Callable, Optional
+from panssrator import config, utils, backends, io_tools, synthetic_data, ssr_discovery, annotator, \
+    primer_design, epcr, genotyper
+from panssrator import main as pipeline
+
+BENCHMARK_VERSION = 2
+
+# Fractional slowdown relative to a previous result that is reported as a regression
+REGRESSION_TOLERANCE = 0.2
+
+# Benchmark progress is logged here, so it stays visible while the pipeline logger is quietened.
+logger = utils.logger.getChild("bench")
+logger.setLevel(logging.INFO)
+
+def _peak_rss_mb(func: Callable[[], Any]) -> Dict[str, float]:
+    """
+    Peak resident set size of a forked child running func, which unlike tracemalloc includes
+    C allocations (pysam, primer3, numpy). The child starts with this process's memory, so
+    'extra_rss_mb' (peak above an idle child) is the stage's own share.
+    """
+    def child_peak(target):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                target()
+            finally:
+                os._exit(0)
+        _, _, usage = os.wait4(pid, 0)
+        # ru_maxrss is in KiB on Linux and in bytes on macOS.
+        return usage.ru_maxrss / (2 ** 20 if sys.platform == "darwin" else 2 ** 10)
+
+    baseline = child_peak(lambda: None)
+    peak = child_peak(func)
+    return {"peak_rss_mb": peak, "extra_rss_mb": max(0.0, peak - baseline)}
+
+def _measure(func: Callable[[], Any], repeats: int) -> Dict[str, float]:
+    """
+    Best-of-repeats wall time, then one extra traced run for the peak Python heap and,
+    where os.fork is available, one forked run for peak RSS. One untimed warm-up call
+    comes first, so lazy engine imports and caches filled on first use are not counted.
+    """
+    func()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    # Traced separately since tracemalloc slows Python code down considerably.
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result = {"seconds": min(times), "peak_py_heap_mb": peak / 2 ** 20}
+    if hasattr(os, "fork"):
+        result.update(_peak_rss_mb(func))
+    return result
+
+def _concordance(truth: Dict[str, Dict[tuple, List[int]]], ssrs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Compare genotype_marker calls with the simulated alleles: 'call_rate' is the fraction
+    of sample x marker pairs called, 'concordance' the fraction of calls matching the truth
+    (a single-allele call counts as homozygous).
+    """
+    called = correct = 0
+    for bam, alleles in truth.items():
+        for rec in ssrs:
+            genotype = genotyper.genotype_marker(bam, rec)["genotype"]
+            if genotype is None:
+                continue
+            called += 1
+            call = sorted(genotype["alleles"] * (2 if len(genotype["alleles"]) == 1 else 1))
+            correct += call == alleles[(rec["chrom"], rec["start"])]
+    total = len(truth) * len(ssrs)
+    return {"call_rate": called / total if total else None, "concordance": correct / called if called else None}
+
+def _stages(data: Dict[str, Any], work_dir: str, n_samples: int, seed: int) -> List[Dict[str, Any]]:
+    """
+    Build the stage table for one scale: name, engines required, work units (with unit name)
+    and a zero-argument callable performing the timed work. Setup is done here, untimed.
+    """
+    genome = next(iter(data["genomes"].values()))
+    contigs = dict(io_tools.read_fasta(genome["fasta"]))
+    ssrs = genome["ssrs"]
+    total_bp = sum(len(seq) for seq in contigs.values())
+    all_bp = sum(sum(g["contig_lengths"].values()) for g in data["genomes"].values())
+    markers_file = os.path.join(work_dir, "markers.tsv")
+    synthetic_data.write_markers(markers_file, ssrs)
+    # Primer pairs taken from the flanks of the first planted SSRs, in the orientation simulate_epcr expects.
+    primer_pairs = [{"forward": contigs[r["chrom"]][r["start"] - 121:r["start"] - 101],
+                     "reverse": contigs[r["chrom"]][r["end"] + 100:r["end"] + 120]} for r in ssrs[:10]]
+    epcr_engine = epcr.resolve_backend()
+    state = {}
+
+    def annotation_trees():
+        if "trees" not in state:
+            state["trees"] = annotator.load_annotation(genome["gff"])
+        return state["trees"]
+
+    def annotate():
+        trees = annotation_trees()
+        for rec in ssrs:
+            annotator.annotate_ssr(rec, trees)
+
+    def bams():
+        if "bams" not in state:
+            bam_dir = os.path.join(work_dir, "bams")
+            state["truth"] = synthetic_data.simulate_bams(bam_dir, contigs, ssrs, n_samples=n_samples, seed=seed)
+            state["bams"] = list(state["truth"])
+            state["bam_dir"] = bam_dir
+        return state["bams"]
+
+    return [
+        # Startup cost every command-line run (e.g. genotype mode) pays: a fresh interpreter
+        # importing main.py, run from the package's parent so this copy is imported.
+        {"name": "main_import", "engines": [], "units": 1, "unit": "runs",
+         "func": lambda: subprocess.run([sys.executable, "-c", "import panssrator.main"],
+                                        cwd=os.path.dirname(config.BASE_DIR), check=True)},
+        {"name": "detect_ssrs", "engines": [], "units": total_bp, "unit": "bp",
+         "func": lambda: [ssr_discovery.detect_ssrs(seq) for seq in contigs.values()]},
+        {"name": "load_annotation", "engines": ["intervaltree"], "units": genome["n_features"], "unit": "features",
+         "func": lambda: annotator.load_annotation(genome["gff"])},
+        {"name": "annotate_ssr", "engines": ["intervaltree"], "units": len(ssrs), "unit": "ssrs",
+         "setup": annotation_trees, "func": annotate},
+        {"name": "design_primers_for_ssr", "engines": ["primer3"], "units": len(ssrs), "unit": "ssrs",
+         "func": lambda: [primer_design.design_primers_for_ssr(rec, contigs[rec["chrom"]]) for rec in ssrs]},
+        {"name": "simulate_epcr", "engines": [epcr_engine], "units": total_bp * len(primer_pairs), "unit": "bp",
+         "func": lambda: [epcr.simulate_epcr(seq, pair) for seq in contigs.values() for pair in primer_pairs]},
+        {"name": "genotype_marker", "engines": ["pysam"], "units": len(ssrs) * n_samples, "unit": "calls",
+         "setup": bams, "check": lambda: _concordance(state["truth"], ssrs),
+         "func": lambda: [genotyper.genotype_marker(bam, rec) for bam in bams() for rec in ssrs]},
+        {"name": "genome_mode", "engines": ["intervaltree", "primer3", epcr_engine], "units": all_bp, "unit": "bp",
+         "func": lambda: pipeline.genome_mode(data["genome_dir"], data["annot_dir"],
+                                              os.path.join(work_dir, "genome_mode.tsv"))},
+        {"name": "genotype_mode", "engines": ["pysam"], "units": len(ssrs) * n_samples, "unit": "calls",
+         "setup": bams,
+         "func": lambda: pipeline.genotype_mode(genome["fasta"], markers_file, state["bam_dir"],
+                                                os.path.join(work_dir, "genotype_mode.csv"))},
+    ]
+
+def _scaling_exponent(points: List[Dict[str, Any]]) -> Optional[float]:
+    """Least-squares slope of log(seconds) against log(units): 1.0 is linear scaling."""
+    points = [p for p in points if "seconds" in p and p["seconds"] > 0 and p["units"] > 0]
+    if len(points) < 2:
+        return None
+    xs = [math.log(p["units"]) for p in points]
+    ys = [math.log(p["seconds"]) for p in points]
+    x_mean = sum(xs) / len(xs)
+    y_mean = sum(ys) / len(ys)
+    denom = sum((x - x_mean) ** 2 for x in xs)
+    if denom == 0:
+        return None
+    return sum((x - x_mean) * (y - y_mean) for x, y in zip(xs, ys)) / denom
+
+def run_benchmarks(scales: List[float], work_dir: str, repeats: int = 3, n_genomes: int = 2, n_samples: int = 2,
+                   seed: int = 1, stages: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Run all (or the selected) stages at each scale (genome size in Mb).
+
+    Returns a JSON-serialisable dictionary with environment details, per-stage results
+    for every scale and per-stage scaling exponents.
+    """
+    results = {}
+    for scale in scales:
+        scale_dir = os.path.join(work_dir, f"scale_{scale:g}Mb")
+        data = synthetic_data.generate_pangenome(scale_dir, n_genomes=n_genomes, genome_size=int(scale * 1e6),
+                                                 seed=seed)
+        for stage in _stages(data, scale_dir, n_samples, seed):
+            if stages and stage["name"] not in stages:
+                continue
+            point = {"scale_mb": scale, "units": stage["units"], "unit": stage["unit"]}
+            missing = [e for e in stage["engines"] if not backends.is_available(e)]
+            if missing:
+                point["skipped"] = f"missing engine: {', '.join(missing)}"
+            else:
+                if "setup" in stage:
+                    stage["setup"]()
+                point.update(_measure(stage["func"], repeats))
+                point["throughput"] = stage["units"] / point["seconds"] if point["seconds"] else None
+                if "check" in stage:
+                    point.update(stage["check"]())
+            results.setdefault(stage["name"], []).append(point)
+            if "skipped" in point:
+                logger.info("%24s @ %g Mb: %s", stage["name"], scale, point["skipped"])
+            else:
+                memory = f"Python heap {point['peak_py_heap_mb']:.1f} MB"
+                if "extra_rss_mb" in point:
+                    memory += f", RSS +{point['extra_rss_mb']:.1f} MB"
+                if point.get("concordance") is not None:
+                    memory += f", call rate {point['call_rate']:.1%}, concordance {point['concordance']:.1%}"
+                logger.info("%24s @ %g Mb: %.3f s, %.3g %s/s, %s", stage["name"], scale,
+                            point["seconds"], point["throughput"], stage["unit"], memory)
+    return {
+        "benchmark_version": BENCHMARK_VERSION,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "epcr_backend": epcr.resolve_backend(),
+        "settings": {"scales_mb": scales, "repeats": repeats, "n_genomes": n_genomes,
+                     "n_samples": n_samples, "seed": seed},
+        "results": results,
+        "scaling": {name: _scaling_exponent(points) for name, points in results.items()},
+    }
+
+def compare_results(current: Dict[str, Any], previous: Dict[str, Any],
+                    tolerance: float = REGRESSION_TOLERANCE) -> Dict[str, Any]:
+    """
+    Compare stage timings against a previous benchmark JSON at matching scales.
+    Returns per-stage time ratios (current / previous) and the list of regressions.
+    """
+    ratios = {}
+    regressions = []
+    for name, points in current["results"].items():
+        old_points = {p["scale_mb"]: p for p in previous.get("results", {}).get(name, [])}
+        for point in points:
+            old = old_points.get(point["scale_mb"])
+            if not old or "seconds" not in point or not old.get("seconds"):
+                continue
+            ratio = point["seconds"] / old["seconds"]
+            ratios.setdefault(name, {})[f"{point['scale_mb']:g}"] = ratio
+            if ratio > 1 + tolerance:
+                regressions.append({"stage": name, "scale_mb": point["scale_mb"], "ratio": ratio})
+    return {"tolerance": tolerance, "time_ratios": ratios, "regressions": regressions}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="PanSSRAtor benchmark suite")
+    parser.add_argument("--scales", default="0.1,0.3,1", help="Comma-separated genome sizes in Mb")
+    parser.add_argument("--output", required=True, help="JSON file for benchmark results")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed repeats per stage (best is reported)")
+    parser.add_argument("--genomes", type=int, default=2, help="Number of synthetic genomes")
+    parser.add_argument("--samples", type=int, default=2, help="Number of simulated BAM samples")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for the synthetic data")
+    parser.add_argument("--stages", help="Comma-separated subset of stages to run")
+    parser.add_argument("--epcr_backend", choices=["auto"] + list(epcr.EPCR_BACKENDS), default=config.EPCR_BACKEND,
+                        help="Primer matching engine for ePCR")
+    parser.add_argument("--work_dir", help="Directory for synthetic data (default: temporary, removed afterwards)")
+    parser.add_argument("--compare", help="Previous benchmark JSON to check for regressions")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    config.EPCR_BACKEND = args.epcr_backend
+    # Per-call timing/info logs from the pipeline would swamp the output and skew timings;
+    # the benchmark's own logger keeps its INFO level.
+    utils.setup_logging(logging.WARNING)
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="panssr_bench_")
+    try:
+        report = run_benchmarks([float(s) for s in args.scales.split(",")], work_dir, repeats=args.repeats,
+                                n_genomes=args.genomes, n_samples=args.samples, seed=args.seed,
+                                stages=args.stages.split(",") if args.stages else None)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    if args.compare:
+        with open(args.compare, "r") as f:
+            report["comparison"] = compare_results(report, json.load(f))
+        for reg in report["comparison"]["regressions"]:
+            logger.warning("Regression: %s @ %g Mb is %.2fx slower", reg["stage"], reg["scale_mb"], reg["ratio"])
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    logger.info("Benchmark results saved to %s", args.output)
+
+if __name__ == '__main__':
+    main()
@@ -48,6 +48,13 @@ MAX_EPCR_COST = 3
 # Maximum allowed product length for ePCR simulation (in bp)
 MAX_EPCR_PRODUCT = 1500
 
+# Primer matching engine: "tre" (fuzzy, edit cost), "numpy" (vectorized, mismatches only)
+# or "auto" (tre when installed, otherwise numpy)
+EPCR_BACKEND = "auto"
+
+# Genome positions scanned per block by the numpy ePCR backend (bounds temporary memory)
+EPCR_NUMPY_CHUNK = 1 << 24
+
 # ---------------------------
 # Genotyping Parameters (BAM processing)
 # ---------------------------
@@ -57,11 +64,58 @@ MIN_MAPQ = 45
 # Minimum read support for genotype call
 MIN_READ_SUPPORT = 3
 
+# ---------------------------
+# Allele Sidecar Cache
+# ---------------------------
+# Lower edges of the MAPQ bins stored in per-sample sidecar files. MIN_MAPQ can be
+# re-tuned from the sidecars alone as long as it falls on one of these edges.
+SIDECAR_MAPQ_BINS = [0, 10, 20, 30, 40, 45, 50, 55, 60]
+
+# File suffix of per-sample allele-count sidecar files
+SIDECAR_SUFFIX = ".ssrcache.json.gz"
+
+# ---------------------------
+# Report Generation
+# ---------------------------
+# Marker density bin size along each chromosome (in bp)
+REPORT_BIN_SIZE = 1_000_000
+
+# Chromosomes/contigs with most markers shown individually; the rest are summarised
+REPORT_MAX_CHROMS = 50
+
+# Repeat counts at or above this value share the last histogram bin
+REPORT_MAX_REPEAT = 50
+
+# ---------------------------
+# Server Mode
+# ---------------------------
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+
+# Worker processes evaluating requests (defaults to all CPUs)
+SERVER_WORKERS = os.cpu_count() or 1
+
+# Requests arriving within SERVER_BATCH_WINDOW seconds are sent to a worker together,
+# up to SERVER_BATCH_SIZE requests per batch.
+SERVER_BATCH_SIZE = 32
+SERVER_BATCH_WINDOW = 0.005
+
+# Bases of contigs each server worker keeps decoded for TRE ePCR (least recently used are dropped);
+# the numpy backend reads the shared mask files of the sequence store instead
+SERVER_DECODED_CACHE_BP = 256 << 20
+
+# Number of most recent requests per endpoint kept for latency percentiles
+SERVER_METRICS_WINDOW = 1000
+
 # ---------------------------
 # General Settings
 # ---------------------------
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATABASE_FILE = os.path.join(BASE_DIR, "panssrator.db")
 
+# Directory, created inside the genome directory unless --store_dir is given, holding
+# the flat, memory-mapped contig files built from genome FASTAs
+SEQUENCE_STORE_DIRNAME = ".panssr_seqstore"
+
 # You can add more parameters here as needed.
 
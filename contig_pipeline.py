@@ -0,0 +1,27 @@
+# panssrator/contig_pipeline.py
+from typing import List, Dict, Any, Optional
+from panssrator import config, ssr_discovery, annotator, primer_design, epcr
+
+def process_contig(header: str, seq: str, annot_trees: dict, genome: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Run the genome-mode steps for one contig: SSR detection, annotation, primer design
+    and ePCR. Returns the unfiltered marker records in detection order, tagged with
+    the genome name if given.
+    """
+    # Detect SSRs – if available, you may add chromosome information here.
+    ssrs = ssr_discovery.detect_ssrs(seq)
+    for rec in ssrs:
+        rec["chrom"] = header  # assume header equals chromosome ID
+        rec["genome"] = genome
+        rec["annotation"] = annotator.annotate_ssr(rec, annot_trees)
+        # Design primers: extract flanking region from the sequence
+        rec["primers"] = primer_design.design_primers_for_ssr(rec, seq, flank=config.FLANK_SIZE)
+        # Run ePCR simulation
+        if rec.get("primers"):
+            # Extract primer pair (using the first left and right primer, if available)
+            primer_pair = {
+                "forward": rec["primers"].get("PRIMER_LEFT_0_SEQUENCE", ""),
+                "reverse": rec["primers"].get("PRIMER_RIGHT_0_SEQUENCE", "")
+            }
+            rec["amplicon_sizes"] = epcr.simulate_epcr(seq, primer_pair, max_cost=config.MAX_EPCR_COST)
+    return ssrs
@@ -1,17 +1,27 @@
 # panssrator/epcr.py
-import re
-import sys
-from panssrator import config, utils
+from functools import lru_cache
+from typing import List, Optional
+from panssrator import config, utils, backends
 
-try:
-    import tre
-except ImportError:
-    utils.do_error("The 'tre' module is required for ePCR simulation. Please install it from https://github.com/laurikari/tre/")
+# IUPAC nucleotide code -> bit mask over A=1, C=2, G=4, T=8 (used by the numpy matcher)
+IUPAC_MASKS = {
+    "A": 1, "C": 2, "G": 4, "T": 8,
+    "R": 5, "Y": 10, "S": 6, "W": 9,
+    "K": 12, "M": 3,
+    "B": 14, "D": 13, "H": 11, "V": 7,
+    "N": 15, "X": 15
+}
 
+# Byte -> genome base mask for bytes.translate; anything but ACGT/acgt maps to 0.
+BASE_MASK_TABLE = bytes(IUPAC_MASKS[chr(b).upper()] if chr(b) in "ACGTacgt" else 0 for b in range(256))
+
+@lru_cache(maxsize=1024)
 def compile_primer_pattern(primer_seq: str) -> object:
     """
     Compile a primer sequence (with ambiguity codes replaced) into a TRE regex pattern.
+    Patterns are cached, since the same primers are searched against many contigs.
     """
+    tre = backends.load("tre")
     regex_seq = replace_ambiguity_codes(primer_seq)
     try:
         pattern = tre.compile(regex_seq, tre.EXTENDED)
@@ -19,44 +29,107 @@ def compile_primer_pattern(primer_seq: str) -> object:
         utils.do_error(f"Error compiling primer pattern: {e}")
     return pattern
 
-def simulate_epcr(genome_seq: str, primer_pair: dict, max_cost: int = config.MAX_EPCR_COST) -> list:
+def _tre_positions(genome_seq: str, primer_seq: str, max_cost: int) -> List[int]:
+    """Start positions of fuzzy primer matches (edit cost <= max_cost) using TRE."""
+    pattern = compile_primer_pattern(primer_seq)
+    positions = []
+    pos = 0
+    while True:
+        m = pattern.search(genome_seq, pos, fuzzyness=max_cost)
+        if not m:
+            break
+        positions.append(m.start())
+        pos = m.start() + 1
+    return positions
+
+# Single-entry cache of the last encoded genome; genome mode searches one contig
+# for every SSR on it, so the contig is only encoded once.
+_encoded = {"seq": None, "codes": None}
+
+def encode_sequence(seq):
+    """
+    Encode a sequence (str, or a bytes-like buffer such as an mmap, read without copying)
+    as a numpy array of base bit masks; anything but ACGT encodes as 0.
+    """
+    np = backends.load("numpy")
+    lut = np.frombuffer(BASE_MASK_TABLE, dtype=np.uint8)
+    if isinstance(seq, str):
+        seq = seq.encode("ascii", errors="replace")
+    return lut[np.frombuffer(seq, dtype=np.uint8)]
+
+def _encode_genome(genome_seq):
+    """
+    Encoded form of genome_seq, which may already be encoded (an array from encode_sequence
+    or SequenceStore.masks).
+    """
+    if not isinstance(genome_seq, str):
+        return genome_seq
+    if _encoded["seq"] is not genome_seq:
+        _encoded.update(seq=genome_seq, codes=encode_sequence(genome_seq))
+    return _encoded["codes"]
+
+def _numpy_positions(genome_seq, primer_seq: str, max_cost: int) -> List[int]:
+    """
+    Start positions where the primer matches with at most max_cost mismatches.
+
+    Pure numpy fallback for TRE: substitutions only (no indels), IUPAC codes in
+    the primer are honoured and soft-masked (lowercase) genome bases match.
+    genome_seq may be a str or an already encoded array (see encode_sequence).
+    """
+    np = backends.load("numpy")
+    try:
+        masks = [IUPAC_MASKS[base] for base in primer_seq.upper()]
+    except KeyError as e:
+        utils.do_error(f"Unrecognized nucleotide code: {e}")
+    codes = _encode_genome(genome_seq)
+    n_windows = len(codes) - len(masks) + 1
+    if not masks or n_windows <= 0:
+        return []
+    positions = []
+    # Process the genome in chunks to bound the size of the temporary arrays.
+    for offset in range(0, n_windows, config.EPCR_NUMPY_CHUNK):
+        stop = min(n_windows, offset + config.EPCR_NUMPY_CHUNK)
+        mismatches = np.zeros(stop - offset, dtype=np.uint16)
+        for j, mask in enumerate(masks):
+            mismatches += (codes[offset + j:stop + j] & mask) == 0
+        positions.extend((np.flatnonzero(mismatches <= max_cost) + offset).tolist())
+    return positions
+
+# ePCR backend name -> function(genome_seq, primer_seq, max_cost) returning match start positions
+EPCR_BACKENDS = {
+    "tre": _tre_positions,
+    "numpy": _numpy_positions,
+}
+
+def resolve_backend(name: Optional[str] = None) -> str:
+    """Resolve a backend name ('auto' picks tre when installed, otherwise numpy)."""
+    name = name or config.EPCR_BACKEND
+    if name == "auto":
+        return "tre" if backends.is_available("tre") else "numpy"
+    if name not in EPCR_BACKENDS:
+        utils.do_error(f"Unknown ePCR backend '{name}'. Choose from: auto, {', '.join(EPCR_BACKENDS)}")
+    return name
+
+def simulate_epcr(genome_seq: str, primer_pair: dict, max_cost: int = config.MAX_EPCR_COST,
+                  backend: Optional[str] = None) -> list:
     """
     Simulate in silico PCR by searching for primer binding sites in genome_seq.
-    
+
     Parameters:
-      genome_seq: The target genome sequence.
+      genome_seq: The target genome sequence (for the numpy backend, optionally
+        pre-encoded with encode_sequence or taken from SequenceStore.masks).
       primer_pair: Dictionary with keys 'forward' and 'reverse' containing primer sequences.
       max_cost: Maximum allowed fuzzy matching cost.
-      
+      backend: ePCR backend name (see EPCR_BACKENDS); defaults to config.EPCR_BACKEND.
+
     Returns:
       A list of predicted amplicon sizes (in bp) where both primers are found in correct orientation.
     """
-    # Compile both primer patterns using the TRE module
-    forward_pat = tre.compile(replace_ambiguity_codes(primer_pair.get("forward", "")), tre.EXTENDED)
-    reverse_pat = tre.compile(replace_ambiguity_codes(primer_pair.get("reverse", "")), tre.EXTENDED)
+    find_positions = EPCR_BACKENDS[resolve_backend(backend)]
     # For the reverse primer, in a full implementation we’d search for its reverse complement.
     # Here we assume the provided reverse primer is already in the proper orientation.
-    
-    f_matches = forward_pat.findall(genome_seq, fuzzyness=max_cost)
-    r_matches = reverse_pat.findall(genome_seq, fuzzyness=max_cost)
-    
-    # To get positions, we can use search() instead of findall()
-    f_positions = []
-    pos = 0
-    while True:
-        m = forward_pat.search(genome_seq, pos, fuzzyness=max_cost)
-        if not m:
-            break
-        f_positions.append(m.start())
-        pos = m.start() + 1
-    r_positions = []
-    pos = 0
-    while True:
-        m = reverse_pat.search(genome_seq, pos, fuzzyness=max_cost)
-        if not m:
-            break
-        r_positions.append(m.start())
-        pos = m.start() + 1
+    f_positions = find_positions(genome_seq, primer_pair.get("forward", ""), max_cost)
+    r_positions = find_positions(genome_seq, primer_pair.get("reverse", ""), max_cost)
 
     amplicon_sizes = []
     # For each forward match, find a reverse match that is downstream.
@@ -76,6 +149,7 @@ if __name__ == '__main__':
     # Example test for ePCR simulation
     test_genome = "N" * 100 + "ATGCGT" + "N" * 50 + "CATGCA" + "N" * 100
     primers = {"forward": "ATGCGT", "reverse": "CATGCA"}
-    products = simulate_epcr(test_genome, primers)
-    utils.logger.info("Predicted amplicon sizes: %s", products)
-
+    for name in EPCR_BACKENDS:
+        if backends.is_available(name):
+            products = simulate_epcr(test_genome, primers, backend=name)
+            utils.logger.info("Predicted amplicon sizes (%s): %s", name, products)
@@ -1,8 +1,11 @@
 # panssrator/genotyper.py
-import pysam
 import re
 from collections import Counter
-from panssrator import config, utils
+from typing import Iterator, Tuple, TYPE_CHECKING
+from panssrator import config, utils, backends
+
+if TYPE_CHECKING:
+    import pysam
 
 def count_repeat_units(seq: str, motif: str) -> int:
     """
@@ -17,38 +20,44 @@ def count_repeat_units(seq: str, motif: str) -> int:
         return len(repeated_seq) // len(motif)
     return 0
 
-def genotype_marker(bam_file: str, ssr_record: dict) -> dict:
+def read_spans_ssr(read, start: int, end: int) -> bool:
     """
-    Extract reads from a BAM file that overlap the SSR region,
-    count the repeat units in each read, and call a genotype.
-    
-    Parameters:
-      bam_file: Path to the BAM file.
-      ssr_record: Dictionary with keys including 'chrom', 'start', 'end', 'motif'.
-    
-    Returns:
-      A dictionary containing the most common repeat count and supporting read counts.
+    Return True if the read alignment covers the whole SSR (1-indexed, inclusive)
+    plus one flanking base on each side, so the repeat is not truncated.
+    """
+    if read.reference_end is None:
+        return False
+    return read.reference_start <= start - 2 and read.reference_end >= end + 1
+
+def iter_repeat_observations(bam: "pysam.AlignmentFile", ssr_record: dict) -> Iterator[Tuple[int, str, int]]:
+    """
+    Yield (mapping_quality, strand, repeat_count) for every read spanning the SSR.
+
+    No MAPQ filtering is done here so that callers (e.g. the allele sidecar cache)
+    can apply thresholds later.
     """
-    bam = pysam.AlignmentFile(bam_file, "rb")
-    allele_counts = Counter()
     chrom = ssr_record.get("chrom", None)
     if not chrom:
         utils.do_error("SSR record does not contain chromosome information.")
     start = ssr_record["start"]
     end = ssr_record["end"]
     for read in bam.fetch(chrom, start - 1, end + 1):
-        if read.mapping_quality < config.MIN_MAPQ:
+        if not read_spans_ssr(read, start, end):
             continue
-        # Determine the alignment region overlapping the SSR.
         # This is simplified: in practice, you may want to extract the portion
         # of the read corresponding to the SSR region from the read’s CIGAR string.
-        read_seq = read.query_sequence
-        repeat_count = count_repeat_units(read_seq, ssr_record["motif"])
+        repeat_count = count_repeat_units(read.query_sequence, ssr_record["motif"])
         if repeat_count:
-            allele_counts[repeat_count] += 1
-    bam.close()
-    
-    # Determine genotype based on allele counts
+            yield read.mapping_quality, "-" if read.is_reverse else "+", repeat_count
+
+def call_genotype(allele_counts: Counter) -> dict:
+    """
+    Call a genotype from a repeat-count histogram.
+
+    Returns:
+      A dictionary containing the allele counts and the genotype call (None if
+      fewer than config.MIN_READ_SUPPORT reads support the marker).
+    """
     total = sum(allele_counts.values())
     if total < config.MIN_READ_SUPPORT:
         genotype = None  # Insufficient read support
@@ -63,9 +72,29 @@ def genotype_marker(bam_file: str, ssr_record: dict) -> dict:
                                     most_common[1][0]: most_common[1][1]}}
     return {"allele_counts": dict(allele_counts), "genotype": genotype}
 
+def genotype_marker(bam_file: str, ssr_record: dict) -> dict:
+    """
+    Extract reads from a BAM file that span the SSR region,
+    count the repeat units in each read, and call a genotype.
+    
+    Parameters:
+      bam_file: Path to the BAM file.
+      ssr_record: Dictionary with keys including 'chrom', 'start', 'end', 'motif'.
+    
+    Returns:
+      A dictionary containing the most common repeat count and supporting read counts.
+    """
+    bam = backends.load("pysam").AlignmentFile(bam_file, "rb")
+    allele_counts = Counter()
+    for mapq, _strand, repeat_count in iter_repeat_observations(bam, ssr_record):
+        if mapq < config.MIN_MAPQ:
+            continue
+        allele_counts[repeat_count] += 1
+    bam.close()
+    return call_genotype(allele_counts)
+
 if __name__ == '__main__':
     # Example test: Replace 'example.bam' with an actual BAM file to run this test.
     ssr_example = {"chrom": "chr1", "start": 100, "end": 140, "motif": "AT"}
     gt = genotype_marker("example.bam", ssr_example)
     utils.logger.info("Genotype call: %s", gt)
-
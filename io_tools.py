@@ -7,7 +7,8 @@ def list_files_in_dir(directory, extensions=None):
     List files in a directory; if extensions is provided, filter files by extension.
     """
     files = []
-    for fname in os.listdir(directory):
+    # Sorted so every run (and every node of a sharded run) sees the files in the same order.
+    for fname in sorted(os.listdir(directory)):
         if extensions:
             if any(fname.lower().endswith(ext.lower()) for ext in extensions):
                 files.append(os.path.join(directory, fname))
@@ -15,6 +16,10 @@ def list_files_in_dir(directory, extensions=None):
             files.append(os.path.join(directory, fname))
     return files
 
+def genome_name(genome_file):
+    """Genome name used in marker tables: the FASTA file name without extension."""
+    return os.path.splitext(os.path.basename(genome_file))[0]
+
 def get_genome_annotation_pairs(genome_dir, annot_dir):
     """
     Returns a list of tuples (genome_fasta, annotation_file) by matching based on file basename.
@@ -23,7 +28,7 @@ def get_genome_annotation_pairs(genome_dir, annot_dir):
     annots = list_files_in_dir(annot_dir, extensions=[".gff", ".gtf"])
     pairs = []
     for genome in genomes:
-        base = os.path.splitext(os.path.basename(genome))[0]
+        base = genome_name(genome)
         matching = [a for a in annots if base in os.path.basename(a)]
         if matching:
             pairs.append((genome, matching[0]))
@@ -51,3 +56,88 @@ def read_fasta(filepath):
         if header:
             yield header, "".join(seq_lines)
 
+
+def fasta_index(filepath):
+    """
+    Scan a FASTA file without keeping sequences in memory.
+    Returns a list of (header, byte_offset, sequence_length) tuples, one per record.
+    """
+    index = []
+    offset = 0
+    with open(filepath, "rb") as f:
+        for line in f:
+            if line.startswith(b">"):
+                index.append([line[1:].split()[0].decode(), offset, 0])
+            elif index:
+                index[-1][2] += len(line.rstrip())
+            offset += len(line)
+    return [tuple(rec) for rec in index]
+
+def fasta_contig_names(filepath):
+    """
+    Return the contig names of a FASTA file without reading sequences, from its
+    samtools .fai index if present, otherwise from a header scan.
+    """
+    fai = filepath + ".fai"
+    if os.path.exists(fai):
+        with open(fai, "r") as f:
+            return [line.split("\t")[0] for line in f if line.strip()]
+    return [header for header, _offset, _length in fasta_index(filepath)]
+
+def read_fasta_record(filepath, offset):
+    """Return (header, sequence) of the FASTA record starting at byte_offset (see fasta_index)."""
+    with open(filepath, "rb") as f:
+        f.seek(offset)
+        header = f.readline()[1:].split()[0].decode()
+        seq_lines = []
+        for line in f:
+            if line.startswith(b">"):
+                break
+            seq_lines.append(line.rstrip())
+    return header, b"".join(seq_lines).decode()
+
+MARKER_TABLE_COLUMNS = ["chrom", "start", "end", "motif", "repeat_count", "annotation", "primers", "amplicon_sizes",
+                        "genome"]
+
+def write_marker_table(output, markers):
+    """Write marker records as the genome-mode TSV."""
+    with open(output, "w") as f:
+        f.write("\t".join(MARKER_TABLE_COLUMNS) + "\n")
+        for rec in markers:
+            line = [str(rec.get(col, "")) for col in MARKER_TABLE_COLUMNS]
+            f.write("\t".join(line) + "\n")
+
+def iter_marker_table(markers_file):
+    """
+    Stream a marker TSV as dictionaries keyed by its header columns (values are left as
+    strings), so tables of any size can be aggregated without loading them.
+    """
+    with open(markers_file, "r") as f:
+        columns = next(f).rstrip("\n").split("\t")
+        for line in f:
+            yield dict(zip(columns, line.rstrip("\n").split("\t")))
+
+def load_markers(markers_file):
+    """
+    Load a marker TSV written by genome mode into a list of marker dictionaries
+    with keys 'chrom', 'start', 'end', 'motif' and 'repeat_count', plus 'genome'
+    if the table has a genome column.
+    """
+    markers = []
+    with open(markers_file, "r") as f:
+        columns = next(f).rstrip("\n").split("\t")
+        genome_col = columns.index("genome") if "genome" in columns else None
+        for line in f:
+            parts = line.rstrip("\r\n").split("\t")
+            marker = {
+                "chrom": parts[0],
+                "start": int(parts[1]),
+                "end": int(parts[2]),
+                "motif": parts[3],
+                "repeat_count": int(parts[4])
+                # Additional fields can be added as needed.
+            }
+            if genome_col is not None:
+                marker["genome"] = parts[genome_col]
+            markers.append(marker)
+    return markers
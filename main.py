@@ -7,11 +7,28 @@ Usage:
     python main.py --mode genome --genome_dir ./genomes/ --annot_dir ./annotations/ --output markers.tsv
   Genotype Mode:
     python main.py --mode genotype --reference ref.fasta --markers markers.tsv --bam_dir ./bams/ --output genotypes.csv
+  Extract Mode (write per-sample allele sidecars once, then re-genotype from them):
+    python main.py --mode extract --markers markers.tsv --bam_dir ./bams/ --cache_dir ./sidecars/
+    python main.py --mode genotype --reference ref.fasta --markers markers.tsv --cache_dir ./sidecars/ --output genotypes.csv
+  Sharded Genome Mode (plan once, run each shard on any node with shared storage, then merge):
+    python main.py --mode plan --genome_dir ./genomes/ --annot_dir ./annotations/ --shards 16 --manifest shards.json
+    python main.py --mode run-shard --manifest shards.json --shard_id 0
+    python main.py --mode merge --manifest shards.json --output markers.tsv
+  Report Mode (self-contained HTML summary, from a marker file or all markers of a sharded run):
+    python main.py --mode report --markers markers.tsv --output report.html
+    python main.py --mode report --manifest shards.json --output report.html
+  Serve Mode (keep genomes and annotations loaded for ePCR/annotation/primer/marker queries):
+    python main.py --mode serve --genome_dir ./genomes/ --annot_dir ./annotations/ --markers markers.tsv --port 8765
 """
 
+import os
 import argparse
 import time
-from panssrator import config, utils, io_tools, ssr_discovery, annotator, primer_design, epcr, genotyper, marker_filter
+from panssrator import config, utils, io_tools, annotator, epcr, genotyper, marker_filter, contig_pipeline
+
+# Modules only some modes need (allele_cache, sharding, report_generator, and server with
+# asyncio/multiprocessing) are imported where they are used, to keep startup of the other
+# modes short; benchmark.py's main_import stage measures it.
 
 def genome_mode(genome_dir: str, annot_dir: str, output: str):
     utils.logger.info("Running Genome Mode")
@@ -19,72 +36,70 @@ def genome_mode(genome_dir: str, annot_dir: str, output: str):
     all_markers = []
     for genome_file, annot_file in pairs:
         utils.logger.info("Processing genome: %s", genome_file)
+        # Load annotation once per genome
+        annot_trees = annotator.load_annotation(annot_file)
+        genome = io_tools.genome_name(genome_file)
         # For each FASTA in the genome file (could be multiple contigs)
         for header, seq in io_tools.read_fasta(genome_file):
-            # Detect SSRs – if available, you may add chromosome information here.
-            ssrs = ssr_discovery.detect_ssrs(seq)
-            # Load annotation and add chromosome field
-            annot_trees = annotator.load_annotation(annot_file)
-            for rec in ssrs:
-                rec["chrom"] = header  # assume header equals chromosome ID
-                rec["annotation"] = annotator.annotate_ssr(rec, annot_trees)
-                # Design primers: extract flanking region from the sequence
-                rec["primers"] = primer_design.design_primers_for_ssr(rec, seq, flank=config.FLANK_SIZE)
-                # Run ePCR simulation
-                if rec.get("primers"):
-                    # Extract primer pair (using the first left and right primer, if available)
-                    primer_pair = {
-                        "forward": rec["primers"].get("PRIMER_LEFT_0_SEQUENCE", ""),
-                        "reverse": rec["primers"].get("PRIMER_RIGHT_0_SEQUENCE", "")
-                    }
-                    rec["amplicon_sizes"] = epcr.simulate_epcr(seq, primer_pair, max_cost=config.MAX_EPCR_COST)
-            all_markers.extend(ssrs)
+            all_markers.extend(contig_pipeline.process_contig(header, seq, annot_trees, genome=genome))
     # Filter markers
     filtered_markers = marker_filter.filter_markers(all_markers)
     utils.logger.info("Total markers detected: %d; Filtered markers: %d", len(all_markers), len(filtered_markers))
     # Write results to output (as TSV)
-    with open(output, "w") as f:
-        headers = ["chrom", "start", "end", "motif", "repeat_count", "annotation", "primers", "amplicon_sizes"]
-        f.write("\t".join(headers) + "\n")
-        for rec in filtered_markers:
-            line = [str(rec.get(col, "")) for col in headers]
-            f.write("\t".join(line) + "\n")
+    io_tools.write_marker_table(output, filtered_markers)
     utils.logger.info("Marker database saved to %s", output)
 
-def genotype_mode(reference: str, markers_file: str, bam_dir: str, output: str):
-    utils.logger.info("Running Genotype Mode")
-    # Load reference genome – assume a single FASTA file; you can extend to use an indexed version.
-    ref_seqs = {}
-    for header, seq in io_tools.read_fasta(reference):
-        ref_seqs[header] = seq
-    # Load marker file (TSV)
-    markers = []
-    with open(markers_file, "r") as f:
-        next(f)  # skip header
-        for line in f:
-            parts = line.strip().split("\t")
-            marker = {
-                "chrom": parts[0],
-                "start": int(parts[1]),
-                "end": int(parts[2]),
-                "motif": parts[3],
-                "repeat_count": int(parts[4])
-                # Additional fields can be added as needed.
-            }
-            markers.append(marker)
-    # List BAM files
+def extract_mode(markers_file: str, bam_dir: str, cache_dir: str):
+    from panssrator import allele_cache
+    utils.logger.info("Running Extract Mode")
+    markers = io_tools.load_markers(markers_file)
+    marker_hash = allele_cache.marker_set_hash(markers)
     bam_files = io_tools.list_files_in_dir(bam_dir, extensions=[".bam"])
-    genotype_calls = {}
     for bam in bam_files:
         utils.logger.info("Processing BAM file: %s", bam)
-        genotype_calls[bam] = {}
-        for marker in markers:
-            # Use the reference sequence for the marker’s chromosome.
-            seq = ref_seqs.get(marker["chrom"], "")
-            if not seq:
+        allele_cache.extract_sidecar(bam, markers, cache_dir, marker_hash=marker_hash)
+    utils.logger.info("Allele sidecars for %d BAM files saved to %s", len(bam_files), cache_dir)
+
+def genotype_mode(reference: str, markers_file: str, bam_dir: str, output: str, cache_dir: str = None):
+    utils.logger.info("Running Genotype Mode")
+    # Only the reference contig names are needed, so scan headers instead of loading sequences.
+    ref_contigs = set(io_tools.fasta_contig_names(reference))
+    # Load marker file (TSV)
+    markers = io_tools.load_markers(markers_file)
+    # Only genotype markers whose chromosome is present in the reference.
+    ref_markers = [m for m in markers if m["chrom"] in ref_contigs]
+    genotype_calls = {}
+    if cache_dir:
+        from panssrator import allele_cache
+        # Genotype from allele sidecars, extracting any that are missing or whose BAM changed.
+        marker_hash = allele_cache.marker_set_hash(markers)
+        if bam_dir:
+            bam_files = io_tools.list_files_in_dir(bam_dir, extensions=[".bam"])
+            paths = [allele_cache.sidecar_path(cache_dir, bam, marker_hash) for bam in bam_files]
+        else:
+            paths = allele_cache.find_sidecars(cache_dir, marker_hash)
+            bam_files = [None] * len(paths)
+        for bam, path in zip(bam_files, paths):
+            sidecar = allele_cache.load_sidecar(path, marker_hash) if os.path.exists(path) else None
+            if bam is None and sidecar is not None:
+                # Sidecar-only run: still check the BAM it came from if that is reachable.
+                bam = sidecar["bam"] if os.path.exists(sidecar["bam"]) else None
+            if bam is not None and (sidecar is None or not allele_cache.sidecar_is_current(sidecar, bam)):
+                utils.logger.info("Processing BAM file: %s", bam)
+                path = allele_cache.extract_sidecar(bam, markers, cache_dir, marker_hash=marker_hash)
+                sidecar = allele_cache.load_sidecar(path, marker_hash)
+            if sidecar is None:
                 continue
-            gt = genotyper.genotype_marker(bam, marker)
-            genotype_calls[bam][marker["start"]] = gt
+            genotype_calls[sidecar["bam"]] = allele_cache.genotype_sidecar(sidecar, ref_markers)
+    else:
+        # List BAM files
+        bam_files = io_tools.list_files_in_dir(bam_dir, extensions=[".bam"])
+        for bam in bam_files:
+            utils.logger.info("Processing BAM file: %s", bam)
+            genotype_calls[bam] = {}
+            for marker in ref_markers:
+                gt = genotyper.genotype_marker(bam, marker)
+                genotype_calls[bam][marker["start"]] = gt
     # Write genotype table as CSV
     with open(output, "w") as f:
         header_line = "BAM_file,Marker_start,Genotype\n"
@@ -94,29 +109,97 @@ def genotype_mode(reference: str, markers_file: str, bam_dir: str, output: str):
                 f.write(f"{bam},{marker_start},{call}\n")
     utils.logger.info("Genotype calls saved to %s", output)
 
+def report_mode(markers_file: str, manifest: str, output: str):
+    from panssrator import sharding, report_generator
+    utils.logger.info("Running Report Mode")
+    # Stream the records: a shard manifest gives all (unfiltered) markers, a TSV the final marker set.
+    if manifest:
+        records = sharding.iter_shard_markers(manifest)
+    else:
+        records = io_tools.iter_marker_table(markers_file)
+    stats = report_generator.MarkerStats(filtered=not manifest).update(records)
+    utils.logger.info("Aggregated %d markers", stats.total)
+    report_generator.generate_html_report(stats.to_dict(), output)
+
 def parse_args():
     parser = argparse.ArgumentParser(description="PanSSRAtor – Pan‑Species SSR Annotator")
-    parser.add_argument("--mode", choices=["genome", "genotype"], required=True,
-                        help="Select the mode of operation: genome (SSR discovery) or genotype (genotyping from BAM)")
+    parser.add_argument("--mode", choices=["genome", "genotype", "extract", "serve", "plan", "run-shard", "merge",
+                                           "report"],
+                        required=True,
+                        help="Select the mode of operation: genome (SSR discovery), genotype (genotyping from BAM "
+                             "or allele sidecars), extract (write allele sidecars from BAM), serve (local query "
+                             "server), plan/run-shard/merge (genome mode split into shards) or report (HTML "
+                             "summary of a marker file or shard manifest)")
     parser.add_argument("--genome_dir", help="Directory of genome FASTA files (for genome mode)")
     parser.add_argument("--annot_dir", help="Directory of annotation (GFF/GTF) files (for genome mode)")
     parser.add_argument("--reference", help="Reference genome FASTA (for genotype mode)")
     parser.add_argument("--markers", help="Marker file (from genome mode, for genotype mode)")
     parser.add_argument("--bam_dir", help="Directory of BAM files (for genotype mode)")
-    parser.add_argument("--output", required=True, help="Output file (or prefix) for results")
+    parser.add_argument("--cache_dir", help="Directory of per-sample allele sidecar files (for extract/genotype mode)")
+    parser.add_argument("--output", help="Output file (or prefix) for results")
+    parser.add_argument("--epcr_backend", choices=["auto"] + list(epcr.EPCR_BACKENDS), default=config.EPCR_BACKEND,
+                        help="Primer matching engine for ePCR: tre (fuzzy), numpy (mismatches only) or auto")
+    parser.add_argument("--manifest", help="Shard manifest file (for plan/run-shard/merge mode)")
+    parser.add_argument("--shards", type=int, help="Number of shards to plan (for plan mode)")
+    parser.add_argument("--shard_id", type=int, help="Shard to process (for run-shard mode)")
+    parser.add_argument("--force", action="store_true", help="Re-run a shard even if its output exists")
+    parser.add_argument("--store_dir",
+                        help="Directory for memory-mapped contig files (for serve mode; default: "
+                             f"{config.SEQUENCE_STORE_DIRNAME} inside --genome_dir)")
+    parser.add_argument("--host", default=config.SERVER_HOST, help="Address to listen on (for serve mode)")
+    parser.add_argument("--port", type=int, default=config.SERVER_PORT, help="TCP port to listen on (for serve mode)")
+    parser.add_argument("--socket", help="Listen on this Unix socket instead of TCP (for serve mode)")
+    parser.add_argument("--workers", type=int, default=config.SERVER_WORKERS,
+                        help="Number of worker processes (for serve mode)")
     return parser.parse_args()
 
 def main():
     args = parse_args()
     start = time.time()
+    config.EPCR_BACKEND = args.epcr_backend
     if args.mode == "genome":
-        if not args.genome_dir or not args.annot_dir:
-            utils.do_error("Genome mode requires --genome_dir and --annot_dir.")
+        if not args.genome_dir or not args.annot_dir or not args.output:
+            utils.do_error("Genome mode requires --genome_dir, --annot_dir and --output.")
         genome_mode(args.genome_dir, args.annot_dir, args.output)
     elif args.mode == "genotype":
-        if not args.reference or not args.markers or not args.bam_dir:
-            utils.do_error("Genotype mode requires --reference, --markers, and --bam_dir.")
-        genotype_mode(args.reference, args.markers, args.bam_dir, args.output)
+        if not args.reference or not args.markers or not args.output or not (args.bam_dir or args.cache_dir):
+            utils.do_error("Genotype mode requires --reference, --markers, --output and --bam_dir or --cache_dir.")
+        genotype_mode(args.reference, args.markers, args.bam_dir, args.output, cache_dir=args.cache_dir)
+    elif args.mode == "extract":
+        if not args.markers or not args.bam_dir or not args.cache_dir:
+            utils.do_error("Extract mode requires --markers, --bam_dir and --cache_dir.")
+        extract_mode(args.markers, args.bam_dir, args.cache_dir)
+    elif args.mode == "plan":
+        from panssrator import sharding
+        if not args.genome_dir or not args.annot_dir or not args.shards or not args.manifest:
+            utils.do_error("Plan mode requires --genome_dir, --annot_dir, --shards and --manifest.")
+        sharding.plan_shards(args.genome_dir, args.annot_dir, args.shards, args.manifest)
+    elif args.mode == "run-shard":
+        from panssrator import sharding
+        if not args.manifest or args.shard_id is None:
+            utils.do_error("Run-shard mode requires --manifest and --shard_id.")
+        sharding.run_shard(args.manifest, args.shard_id, force=args.force)
+    elif args.mode == "merge":
+        from panssrator import sharding
+        if not args.manifest or not args.output:
+            utils.do_error("Merge mode requires --manifest and --output.")
+        sharding.merge_shards(args.manifest, args.output)
+    elif args.mode == "report":
+        if not args.output or not (args.markers or args.manifest):
+            utils.do_error("Report mode requires --output and --markers or --manifest.")
+        report_mode(args.markers, args.manifest, args.output)
+    elif args.mode == "serve":
+        import asyncio
+        from panssrator import server
+        if not args.genome_dir:
+            utils.do_error("Serve mode requires --genome_dir.")
+        server.load_state(args.genome_dir, annot_dir=args.annot_dir, markers_file=args.markers,
+                          store_dir=args.store_dir)
+        try:
+            asyncio.run(server.serve(host=args.host, port=args.port, socket_path=args.socket,
+                                     workers=args.workers))
+        except KeyboardInterrupt:
+            utils.logger.info("Server stopped")
     end = time.time()
     utils.logger.info("PanSSRAtor run time: %.2f minutes", (end - start) / 60)
 
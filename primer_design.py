@@ -1,6 +1,5 @@
 # panssrator/primer_design.py
-import primer3
-from panssrator import config, utils
+from panssrator import config, utils, backends
 
 def design_primers_for_ssr(ssr_record: dict, genome_seq: str, flank: int = config.FLANK_SIZE,
                            custom_params: dict = None) -> dict:
@@ -31,6 +30,7 @@ def design_primers_for_ssr(ssr_record: dict, genome_seq: str, flank: int = confi
     }
     
     params = custom_params if custom_params else config.PRIMER_PARAMS
+    primer3 = backends.load("primer3")
     
     try:
         result = primer3.designPrimers(seq_args, params)
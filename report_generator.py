@@ -1,56 +1,228 @@
 # panssrator/report_generator.py
+import re
 import json
-from panssrator import utils
+import html
+from collections import Counter
+from typing import Iterable, List, Dict, Any
+from panssrator import config, utils
 
-def generate_html_report(marker_stats: dict, output_file: str):
+MOTIF_CLASSES = {1: "mono", 2: "di", 3: "tri", 4: "tetra", 5: "penta", 6: "hexa"}
+
+# Pulls the feature type out of an annotation written to a marker TSV as a dict repr
+_ANNOTATION_TYPE = re.compile(r"'type': '([^']*)'")
+
+def _annotation_category(annotation) -> str:
+    """Feature type of an annotation (dict, or its string form from a TSV); 'intergenic' if none."""
+    if isinstance(annotation, dict):
+        return annotation.get("type", "unknown")
+    if not annotation or annotation == "None":
+        return "intergenic"
+    match = _ANNOTATION_TYPE.search(annotation)
+    return match.group(1) if match else "unknown"
+
+def _amplicon_size_count(amplicon_sizes) -> int:
+    """Number of distinct amplicon sizes (list, or its string form from a TSV)."""
+    if isinstance(amplicon_sizes, (list, tuple)):
+        return len(set(amplicon_sizes))
+    values = amplicon_sizes.strip("[] ") if amplicon_sizes else ""
+    return len(set(v.strip() for v in values.split(","))) if values else 0
+
+class MarkerStats:
+    """
+    Aggregates over a stream of marker records. Memory grows with the number of
+    chromosome bins and categories, never with the number of markers.
     """
-    Generate an HTML report from marker statistics.
-    marker_stats: a dictionary containing statistical summaries.
-    The report includes interactive charts using echarts (to be embedded in the HTML).
+
+    def __init__(self, bin_size: int = config.REPORT_BIN_SIZE, max_repeat: int = config.REPORT_MAX_REPEAT,
+                 filtered: bool = False):
+        # filtered: records are a final (post-filter) marker set, in which every marker is
+        # polymorphic by construction, so polymorphism rates are not reported.
+        self.filtered = filtered
+        self.bin_size = bin_size
+        self.max_repeat = max_repeat
+        self.total = 0
+        self.density = {}  # "genome:chrom" (chrom if no genome) -> marker counts per bin
+        self.motif_classes = Counter()
+        self.repeat_counts = Counter()
+        self.annotations = Counter()
+        self.genomes = {}  # genome -> [markers, markers with amplicons, polymorphic markers]
+
+    def add(self, rec: Dict[str, Any]):
+        """Add one marker record (from genome mode, a shard output or a marker TSV row)."""
+        self.total += 1
+        # Every genome of a pan-genome has its own chr1, so density is kept per genome and chromosome.
+        genome_name = rec.get("genome")
+        bins = self.density.setdefault(f"{genome_name}:{rec['chrom']}" if genome_name else rec["chrom"], [])
+        b = (int(rec["start"]) - 1) // self.bin_size
+        if b >= len(bins):
+            bins.extend([0] * (b + 1 - len(bins)))
+        bins[b] += 1
+        self.motif_classes[MOTIF_CLASSES.get(len(rec["motif"]), "other")] += 1
+        self.repeat_counts[min(int(rec["repeat_count"]), self.max_repeat)] += 1
+        self.annotations[_annotation_category(rec.get("annotation"))] += 1
+        genome = self.genomes.setdefault(genome_name or "unknown", [0, 0, 0])
+        n_sizes = _amplicon_size_count(rec.get("amplicon_sizes"))
+        genome[0] += 1
+        genome[1] += n_sizes > 0
+        genome[2] += n_sizes > 1  # same polymorphism rule as marker_filter
+
+    def update(self, records: Iterable[Dict[str, Any]]) -> "MarkerStats":
+        for rec in records:
+            self.add(rec)
+        return self
+
+    def to_dict(self, max_chroms: int = config.REPORT_MAX_CHROMS) -> Dict[str, Any]:
+        """
+        Small, JSON-serialisable summary. Density bins are kept for the max_chroms
+        genome:chromosome pairs with most markers; the rest are only counted.
+        """
+        by_count = sorted(self.density.items(), key=lambda kv: -sum(kv[1]))
+        shown = by_count[:max_chroms]
+        omitted = by_count[max_chroms:]
+        repeat_labels = list(range(min(self.repeat_counts, default=0), max(self.repeat_counts, default=-1) + 1))
+        return {
+            "total_markers": self.total,
+            "filtered": self.filtered,
+            "bin_size": self.bin_size,
+            "density": dict(shown),
+            "omitted_chromosomes": {"chromosomes": len(omitted), "markers": sum(sum(c) for _, c in omitted)},
+            "motif_classes": {name: self.motif_classes[name]
+                              for name in list(MOTIF_CLASSES.values()) + ["other"] if self.motif_classes[name]},
+            "repeat_counts": {
+                "labels": [f">={r}" if r == self.max_repeat else str(r) for r in repeat_labels],
+                "counts": [self.repeat_counts[r] for r in repeat_labels],
+            },
+            "annotations": dict(self.annotations.most_common()),
+            "genomes": {name: {"markers": n, "with_amplicons": amp} if self.filtered else
+                        {"markers": n, "with_amplicons": amp, "polymorphic": poly,
+                         "polymorphism_rate": poly / n if n else 0.0}
+                        for name, (n, amp, poly) in sorted(self.genomes.items())},
+        }
+
+# ---------------------------
+# Self-contained HTML (inline SVG, no external scripts)
+# ---------------------------
+def _short_label(label, width: int) -> str:
+    """Shorten an axis label from the left, so the chromosome of a 'genome:chrom' label stays visible."""
+    label = str(label)
+    return label if len(label) <= width else "\u2026" + label[-(width - 1):]
+
+def _svg_bar_chart(title: str, labels: List[str], values: List[float], width: int = 720, height: int = 280,
+                   value_format: str = "{:,}") -> str:
+    left, right, top, bottom = 60, 10, 30, 70
+    plot_w, plot_h = width - left - right, height - top - bottom
+    max_v = max(values, default=0) or 1
+    n = max(len(values), 1)
+    bar_w = plot_w / n
+    label_every = max(1, n // 40)  # keep at most ~40 axis labels
+    parts = [f'<svg width="{width}" height="{height}" role="img"><title>{html.escape(title)}</title>',
+             f'<text x="{width / 2}" y="18" text-anchor="middle" class="t">{html.escape(title)}</text>',
+             f'<text x="{left - 4}" y="{top + 4}" text-anchor="end">{value_format.format(max_v)}</text>',
+             f'<line x1="{left}" y1="{top + plot_h}" x2="{width - right}" y2="{top + plot_h}" class="ax"/>']
+    for i, (label, value) in enumerate(zip(labels, values)):
+        h = plot_h * value / max_v
+        x = left + i * bar_w
+        parts.append(f'<rect x="{x:.1f}" y="{top + plot_h - h:.1f}" width="{max(bar_w - 1, 0.5):.1f}" '
+                     f'height="{h:.1f}"><title>{html.escape(str(label))}: {value_format.format(value)}</title></rect>')
+        if i % label_every == 0:
+            lx, ly = x + bar_w / 2, top + plot_h + 10
+            parts.append(f'<text x="{lx:.1f}" y="{ly}" transform="rotate(45 {lx:.1f} {ly})">'
+                         f'{html.escape(_short_label(label, 14))}</text>')
+    parts.append("</svg>")
+    return "".join(parts)
+
+def _svg_density(density: Dict[str, List[int]], bin_size: int, width: int = 720, row_height: int = 26) -> str:
+    """One filled density profile per chromosome, on a shared position and count scale."""
+    left, right = 130, 10
+    plot_w = width - left - right
+    max_bins = max((len(c) for c in density.values()), default=1) or 1
+    max_v = max((max(c) for c in density.values() if c), default=1) or 1
+    height = row_height * len(density) + 24
+    parts = [f'<svg width="{width}" height="{height}" role="img"><title>Marker density</title>']
+    for row, (chrom, counts) in enumerate(density.items()):
+        base = (row + 1) * row_height
+        points = [f"{left},{base}"]
+        for b, count in enumerate(counts):
+            x = left + plot_w * b / max_bins
+            y = base - (row_height - 4) * count / max_v
+            points.append(f"{x:.1f},{y:.1f} {left + plot_w * (b + 1) / max_bins:.1f},{y:.1f}")
+        points.append(f"{left + plot_w * len(counts) / max_bins:.1f},{base}")
+        parts.append(f'<text x="{left - 6}" y="{base - 6}" text-anchor="end">'
+                     f'{html.escape(_short_label(chrom, 18))}</text>'
+                     f'<polygon points="{" ".join(points)}"><title>{html.escape(chrom)}: {sum(counts):,} markers'
+                     f'</title></polygon>')
+    parts.append(f'<text x="{left}" y="{height - 4}">0</text>'
+                 f'<text x="{width - right}" y="{height - 4}" text-anchor="end">{max_bins * bin_size / 1e6:g} Mb '
+                 f'({bin_size / 1e6:g} Mb bins, max {max_v:,} markers/bin)</text></svg>')
+    return "".join(parts)
+
+def generate_html_report(marker_stats: dict, output_file: str):
     """
-    # For illustration, we produce a simple HTML template.
-    html_template = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="utf-8">
-        <title>PanSSRAtor Marker Report</title>
-        <script src="https://cdn.jsdelivr.net/npm/echarts/dist/echarts.min.js"></script>
-        <style>
-            body {{ font-family: Arial, sans-serif; }}
-            .chart {{ width: 600px; height: 400px; margin: 20px auto; }}
-        </style>
-    </head>
-    <body>
-        <h1>PanSSRAtor Marker Report</h1>
-        <div id="chart1" class="chart"></div>
-        <script>
-            var chartDom = document.getElementById('chart1');
-            var myChart = echarts.init(chartDom);
-            var option;
-            option = {{
-                title: {{
-                    text: 'Marker Distribution'
-                }},
-                tooltip: {{}},
-                legend: {{
-                    data: ['Count']
-                }},
-                xAxis: {{
-                    data: {json.dumps(marker_stats.get('x_axis', []))}
-                }},
-                yAxis: {{}},
-                series: [{{
-                    name: 'Count',
-                    type: 'bar',
-                    data: {json.dumps(marker_stats.get('counts', []))}
-                }}]
-            }};
-            myChart.setOption(option);
-        </script>
-    </body>
-    </html>
+    Generate a self-contained HTML report (inline SVG charts, no external scripts) from
+    marker statistics, normally MarkerStats.to_dict(). A legacy 'x_axis'/'counts' pair
+    is rendered as an extra bar chart. The statistics are also embedded as JSON.
     """
+    sections = []
+    if "total_markers" in marker_stats:
+        density = marker_stats["density"]
+        omitted = marker_stats["omitted_chromosomes"]
+        sections.append(f"<p>{marker_stats['total_markers']:,} markers on {len(density) + omitted['chromosomes']:,} "
+                        f"chromosomes/contigs.</p>")
+        sections.append(_svg_bar_chart("Markers per genome:chromosome", list(density),
+                                       [sum(c) for c in density.values()]))
+        if omitted["chromosomes"]:
+            sections.append(f"<p>{omitted['chromosomes']:,} smaller chromosomes/contigs with "
+                            f"{omitted['markers']:,} markers are not shown individually.</p>")
+        sections.append(_svg_density(density, marker_stats["bin_size"]))
+        sections.append(_svg_bar_chart("Motif class", list(marker_stats["motif_classes"]),
+                                       list(marker_stats["motif_classes"].values())))
+        sections.append(_svg_bar_chart("Repeat count", marker_stats["repeat_counts"]["labels"],
+                                       marker_stats["repeat_counts"]["counts"]))
+        sections.append(_svg_bar_chart("Annotation category", list(marker_stats["annotations"]),
+                                       list(marker_stats["annotations"].values())))
+        genomes = marker_stats["genomes"]
+        if marker_stats.get("filtered"):
+            rows = "".join(f"<tr><td>{html.escape(name)}</td><td>{g['markers']:,}</td>"
+                           f"<td>{g['with_amplicons']:,}</td></tr>" for name, g in genomes.items())
+            sections.append("<p>Post-filter marker set: every marker is polymorphic by construction, so "
+                            "polymorphism rates are only reported for unfiltered (shard manifest) input.</p>"
+                            f"<table><tr><th>Genome</th><th>Markers</th><th>With amplicons</th></tr>{rows}</table>")
+        else:
+            sections.append(_svg_bar_chart("Polymorphism rate per genome", list(genomes),
+                                           [g["polymorphism_rate"] for g in genomes.values()], value_format="{:.1%}"))
+            rows = "".join(f"<tr><td>{html.escape(name)}</td><td>{g['markers']:,}</td><td>{g['with_amplicons']:,}</td>"
+                           f"<td>{g['polymorphic']:,}</td><td>{g['polymorphism_rate']:.1%}</td></tr>"
+                           for name, g in genomes.items())
+            sections.append("<table><tr><th>Genome</th><th>Markers</th><th>With amplicons</th><th>Polymorphic</th>"
+                            f"<th>Rate</th></tr>{rows}</table>")
+    if "x_axis" in marker_stats:
+        sections.append(_svg_bar_chart("Marker Distribution", marker_stats["x_axis"], marker_stats.get("counts", [])))
+    # "</" is escaped so the embedded JSON cannot close the script element.
+    data = json.dumps(marker_stats, separators=(",", ":")).replace("</", "<\\/")
+    body = "\n".join(f'<div class="chart">{s}</div>' for s in sections)
+    html_template = f"""<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <title>PanSSRAtor Marker Report</title>
+    <style>
+        body {{ font-family: Arial, sans-serif; max-width: 760px; margin: 0 auto; }}
+        .chart {{ margin: 20px 0; }}
+        svg text {{ font-size: 11px; fill: #333; }}
+        svg text.t {{ font-size: 14px; font-weight: bold; }}
+        svg rect, svg polygon {{ fill: #5470c6; }}
+        svg line.ax {{ stroke: #999; }}
+        table {{ border-collapse: collapse; }}
+        td, th {{ border: 1px solid #ccc; padding: 2px 8px; text-align: right; }}
+    </style>
+</head>
+<body>
+    <h1>PanSSRAtor Marker Report</h1>
+    {body}
+    <script type="application/json" id="marker-stats">{data}</script>
+</body>
+</html>
+"""
     with open(output_file, "w") as f:
         f.write(html_template)
     utils.logger.info("HTML report generated at %s", output_file)
@@ -62,4 +234,3 @@ if __name__ == '__main__':
         "counts": [120, 80, 150]
     }
     generate_html_report(stats, "report.html")
-
@@ -0,0 +1,136 @@
+# panssrator/sequence_store.py
+import os
+import json
+import mmap
+from typing import Dict, List, Optional
+from panssrator import utils, backends, epcr
+
+INDEX_FILE = "index.json"
+
+# Bumped whenever the on-disk layout changes, so stores built by older versions are rebuilt.
+STORE_VERSION = 2
+
+class SequenceStore:
+    """
+    Flat, memory-mapped copies of FASTA contigs.
+
+    Each genome is converted once into one newline-free file per contig under
+    store_dir/<genome>/, so later runs (and forked worker processes) can slice
+    sequences without re-parsing the FASTA and share the pages through the OS cache.
+    Next to each contig file a .mask file holds the contig as ePCR base masks (one byte
+    per base, see epcr.BASE_MASK_TABLE), so the numpy matcher needs no per-process copy.
+    """
+
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        self.index = {}   # genome -> {contig: {"file": ..., "mask_file": ..., "length": ...}}
+        self._maps = {}   # (genome, contig) -> mmap.mmap
+        self._masks = {}  # (genome, contig) -> numpy.memmap
+        os.makedirs(store_dir, exist_ok=True)
+
+    def add_fasta(self, name: str, fasta_path: str):
+        """Register a genome FASTA under name, (re)building its flat files if the FASTA changed."""
+        genome_dir = os.path.join(self.store_dir, name)
+        index_path = os.path.join(genome_dir, INDEX_FILE)
+        stat = os.stat(fasta_path)
+        index = None
+        if os.path.exists(index_path):
+            with open(index_path, "r") as f:
+                index = json.load(f)
+            if (index.get("version") != STORE_VERSION or index.get("source") != os.path.abspath(fasta_path)
+                    or index.get("size") != stat.st_size or index.get("mtime") != stat.st_mtime):
+                index = None
+        if index is None:
+            index = self._build(genome_dir, fasta_path, stat)
+        self.index[name] = index["contigs"]
+
+    @utils.timeit
+    def _build(self, genome_dir: str, fasta_path: str, stat: os.stat_result) -> dict:
+        """Stream a FASTA into per-contig flat files without holding a whole contig in memory."""
+        utils.logger.info("Building sequence store for %s", fasta_path)
+        os.makedirs(genome_dir, exist_ok=True)
+        contigs = {}
+        out = mask_out = None
+        with open(fasta_path, "rb") as f:
+            for line in f:
+                line = line.rstrip()
+                if line.startswith(b">"):
+                    if out:
+                        out.close()
+                        mask_out.close()
+                    header = line[1:].decode().split()[0]
+                    fname = f"{len(contigs)}.seq"
+                    mask_fname = f"{len(contigs)}.mask"
+                    contigs[header] = {"file": fname, "mask_file": mask_fname, "length": 0}
+                    out = open(os.path.join(genome_dir, fname), "wb")
+                    mask_out = open(os.path.join(genome_dir, mask_fname), "wb")
+                elif out:
+                    out.write(line)
+                    mask_out.write(line.translate(epcr.BASE_MASK_TABLE))
+                    contigs[header]["length"] += len(line)
+        if out:
+            out.close()
+            mask_out.close()
+        index = {
+            "version": STORE_VERSION,
+            "source": os.path.abspath(fasta_path),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "contigs": contigs,
+        }
+        with open(os.path.join(genome_dir, INDEX_FILE), "w") as f:
+            json.dump(index, f)
+        return index
+
+    def genomes(self) -> List[str]:
+        return list(self.index)
+
+    def contigs(self, genome: str) -> Dict[str, int]:
+        """Return a dictionary mapping contig names of a genome to their lengths."""
+        return {contig: info["length"] for contig, info in self.index[genome].items()}
+
+    def _map(self, genome: str, contig: str) -> Optional[mmap.mmap]:
+        key = (genome, contig)
+        if key not in self._maps:
+            info = self.index[genome][contig]
+            if info["length"] == 0:
+                return None  # mmap cannot map empty files
+            with open(os.path.join(self.store_dir, genome, info["file"]), "rb") as f:
+                self._maps[key] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._maps[key]
+
+    def masks(self, genome: str, contig: str):
+        """
+        Return a whole contig as a read-only numpy memmap of ePCR base masks. Processes
+        forked from one store share its pages through the OS cache.
+        """
+        np = backends.load("numpy")
+        key = (genome, contig)
+        if key not in self._masks:
+            info = self.index[genome][contig]
+            if info["length"] == 0:
+                return np.zeros(0, dtype=np.uint8)  # np.memmap cannot map empty files
+            self._masks[key] = np.memmap(os.path.join(self.store_dir, genome, info["mask_file"]),
+                                         dtype=np.uint8, mode="r")
+        return self._masks[key]
+
+    def fetch(self, genome: str, contig: str, start: int = 0, end: Optional[int] = None) -> str:
+        """Return contig[start:end] (0-indexed, half-open) of a genome."""
+        mapped = self._map(genome, contig)
+        if mapped is None:
+            return ""
+        return mapped[start:end].decode("ascii")
+
+    def close(self):
+        for mapped in self._maps.values():
+            mapped.close()
+        self._maps = {}
+        self._masks = {}
+
+if __name__ == '__main__':
+    # Example: assume a genome FASTA "example.fa" exists.
+    store = SequenceStore("seqstore")
+    store.add_fasta("example", "example.fa")
+    for contig, length in store.contigs("example").items():
+        utils.logger.info("%s (%d bp): %s...", contig, length, store.fetch("example", contig, 0, 50))
+    store.close()
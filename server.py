@@ -0,0 +1,345 @@
+# panssrator/server.py
+"""
+Long-running local server that keeps genome sequences and annotation indexes warm.
+
+Genomes are loaded once into a memory-mapped SequenceStore and annotations into
+interval trees before the worker pool is forked, so every request skips the FASTA/GFF
+parsing that a fresh main.py run pays. Requests are JSON over HTTP (TCP or Unix socket):
+
+  POST /epcr      {"forward": ..., "reverse": ..., "genomes": [...], "max_cost": 3}
+  POST /annotate  {"genome": ..., "chrom": ..., "start": ..., "end": ...}
+  POST /primers   {"genome": ..., "chrom": ..., "start": ..., "end": ..., "flank": 100}
+  POST /markers   {"chrom": ..., "start": ..., "end": ..., "genome": ...}  (genome optional)
+  POST /batch     {"requests": [{"op": "epcr", "params": {...}}, ...]}
+  GET  /metrics   per-endpoint request counts and latency percentiles
+  GET  /health    loaded genomes and annotation sets
+"""
+import os
+import json
+import time
+import asyncio
+import multiprocessing
+from bisect import bisect_left
+from collections import deque, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Tuple, Optional
+from panssrator import config, utils, io_tools, annotator, primer_design, epcr
+from panssrator.sequence_store import SequenceStore
+
+# Loaded once in the parent process and inherited by forked workers.
+# "markers" maps (genome, chrom) -> (sorted marker starts, markers sorted by start);
+# genome is None for marker tables without a genome column.
+_STATE = {"store": None, "annotations": {}, "markers": {}}
+
+# Per-worker cache of contigs decoded to str for TRE ePCR: (genome, contig) -> str, least
+# recently used first. The numpy backend needs no copy and reads the store's mask files.
+_DECODED = OrderedDict()
+
+def load_state(genome_dir: str, annot_dir: Optional[str] = None, markers_file: Optional[str] = None,
+               store_dir: Optional[str] = None):
+    """
+    Load the sequence store, annotation trees and marker index served by the workers.
+    The store defaults to config.SEQUENCE_STORE_DIRNAME inside genome_dir.
+    """
+    store = SequenceStore(store_dir or os.path.join(genome_dir, config.SEQUENCE_STORE_DIRNAME))
+    for genome_file in io_tools.list_files_in_dir(genome_dir, extensions=[".fa", ".fasta", ".fna"]):
+        store.add_fasta(io_tools.genome_name(genome_file), genome_file)
+    annotations = {}
+    if annot_dir:
+        for genome_file, annot_file in io_tools.get_genome_annotation_pairs(genome_dir, annot_dir):
+            name = io_tools.genome_name(genome_file)
+            annotations[name] = annotator.load_annotation(annot_file)
+    markers = {}
+    if markers_file:
+        for marker in io_tools.load_markers(markers_file):
+            markers.setdefault((marker.get("genome"), marker["chrom"]), []).append(marker)
+        for key, chrom_markers in markers.items():
+            chrom_markers.sort(key=lambda m: m["start"])
+            markers[key] = ([m["start"] for m in chrom_markers], chrom_markers)
+    _STATE.update(store=store, annotations=annotations, markers=markers)
+    utils.logger.info("Loaded %d genomes, %d annotation sets and %d marker chromosomes",
+                      len(store.genomes()), len(annotations), len(markers))
+
+# ---------------------------
+# Request handlers (run in worker processes)
+# ---------------------------
+def _decoded_contig(genome: str, contig: str) -> str:
+    """Whole contig as a str, cached in this worker up to config.SERVER_DECODED_CACHE_BP bases."""
+    key = (genome, contig)
+    if key in _DECODED:
+        _DECODED.move_to_end(key)
+        return _DECODED[key]
+    seq = _STATE["store"].fetch(genome, contig)
+    if len(seq) <= config.SERVER_DECODED_CACHE_BP:
+        _DECODED[key] = seq
+        while sum(len(s) for s in _DECODED.values()) > config.SERVER_DECODED_CACHE_BP:
+            _DECODED.popitem(last=False)
+    return seq
+
+def _epcr(params: dict) -> dict:
+    store = _STATE["store"]
+    primer_pair = {"forward": params["forward"], "reverse": params["reverse"]}
+    max_cost = params.get("max_cost", config.MAX_EPCR_COST)
+    backend = epcr.resolve_backend()
+    results = {}
+    for genome in params.get("genomes") or store.genomes():
+        hits = {}
+        for contig in store.contigs(genome):
+            # numpy matches on the shared, memory-mapped mask file; only TRE needs a str.
+            if backend == "numpy":
+                seq = store.masks(genome, contig)
+            else:
+                seq = _decoded_contig(genome, contig)
+            sizes = epcr.simulate_epcr(seq, primer_pair, max_cost=max_cost, backend=backend)
+            if sizes:
+                hits[contig] = sizes
+        results[genome] = hits
+    return results
+
+def _annotate(params: dict) -> Optional[dict]:
+    trees = _STATE["annotations"].get(params["genome"], {})
+    return annotator.annotate_ssr({"chrom": params["chrom"], "start": params["start"], "end": params["end"]}, trees)
+
+def _primers(params: dict) -> dict:
+    flank = params.get("flank", config.FLANK_SIZE)
+    # Only fetch the window primer_design extracts, and shift the SSR into window coordinates.
+    offset = max(0, params["start"] - flank - 1)
+    window = _STATE["store"].fetch(params["genome"], params["chrom"], offset, params["end"] + flank)
+    ssr = {"start": params["start"] - offset, "end": params["end"] - offset}
+    return primer_design.design_primers_for_ssr(ssr, window, flank=flank,
+                                                custom_params=params.get("primer_params"))
+
+def _markers(params: dict) -> List[dict]:
+    chrom = params["chrom"]
+    if "genome" in params:
+        keys = [(params["genome"], chrom)]
+    else:
+        keys = [key for key in _STATE["markers"] if key[1] == chrom]
+    start = params.get("start", 0)
+    end = params.get("end")
+    hits = []
+    for key in keys:
+        starts, chrom_markers = _STATE["markers"].get(key, ([], []))
+        # Markers are at most MAX_SSR_LENGTH long, so no overlapping marker starts before this.
+        i = bisect_left(starts, start - config.MAX_SSR_LENGTH)
+        for marker in chrom_markers[i:]:
+            if end is not None and marker["start"] > end:
+                break
+            if marker["end"] >= start:
+                hits.append(marker)
+    return hits
+
+HANDLERS = {
+    "epcr": _epcr,
+    "annotate": _annotate,
+    "primers": _primers,
+    "markers": _markers,
+}
+
+def new_executor(workers: int = config.SERVER_WORKERS) -> ProcessPoolExecutor:
+    """Worker pool; forked explicitly so workers inherit _STATE rather than re-import and start empty."""
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"))
+
+def _run_batch(calls: List[Tuple[str, dict]]) -> List[dict]:
+    """Evaluate a batch of (op, params) calls in a worker; failures are reported per call."""
+    results = []
+    for op, params in calls:
+        try:
+            results.append({"ok": True, "result": HANDLERS[op](params)})
+        except (Exception, SystemExit) as e:  # utils.do_error raises SystemExit
+            results.append({"ok": False, "error": f"{type(e).__name__}: {e}"})
+    return results
+
+# ---------------------------
+# Event loop side
+# ---------------------------
+class LatencyMetrics:
+    """Per-endpoint request counts, error counts and latency percentiles over a sliding window."""
+
+    def __init__(self, window: int = config.SERVER_METRICS_WINDOW):
+        self.window = window
+        self.latencies = {}
+        self.counts = {}
+        self.errors = {}
+
+    def record(self, endpoint: str, seconds: float, ok: bool = True):
+        self.latencies.setdefault(endpoint, deque(maxlen=self.window)).append(seconds)
+        self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+        if not ok:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def summary(self) -> dict:
+        summary = {}
+        for endpoint, latencies in self.latencies.items():
+            ordered = sorted(latencies)
+            summary[endpoint] = {
+                "requests": self.counts[endpoint],
+                "errors": self.errors.get(endpoint, 0),
+                "mean_ms": 1000 * sum(ordered) / len(ordered),
+                "p50_ms": 1000 * ordered[len(ordered) // 2],
+                "p95_ms": 1000 * ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                "max_ms": 1000 * ordered[-1],
+            }
+        return summary
+
+class Batcher:
+    """
+    Collect calls arriving within a short window and hand them to the worker pool
+    in chunks, so many small requests do not each pay a round trip to a worker while
+    a large burst is still spread over all workers.
+    """
+
+    def __init__(self, executor: ProcessPoolExecutor, workers: int = config.SERVER_WORKERS,
+                 batch_size: int = config.SERVER_BATCH_SIZE, window: float = config.SERVER_BATCH_WINDOW):
+        self.executor = executor
+        self.workers = workers
+        self.batch_size = batch_size
+        self.window = window
+        self.queue = asyncio.Queue()
+        self._inflight = set()
+
+    async def submit(self, op: str, params: dict) -> dict:
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((op, params, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            n_chunks = min(self.workers, len(batch))
+            for i in range(n_chunks):
+                task = asyncio.create_task(self._dispatch(batch[i::n_chunks]))
+                self._inflight.add(task)
+                task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch: list):
+        loop = asyncio.get_running_loop()
+        executor = self.executor
+        try:
+            results = await loop.run_in_executor(executor, _run_batch, [(op, params) for op, params, _ in batch])
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool) and self.executor is executor:
+                # A worker died (e.g. killed for memory); the pool stays unusable, so replace it.
+                utils.logger.error("Worker pool broken (%s); restarting %d workers", e, self.workers)
+                executor.shutdown(wait=False)
+                self.executor = new_executor(self.workers)
+            results = [{"ok": False, "error": f"{type(e).__name__}: {e}"} for _ in batch]
+        for (_, _, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+class PanSSRServer:
+    """Minimal HTTP/1.1 JSON front end dispatching calls to a Batcher."""
+
+    def __init__(self, batcher: Batcher):
+        self.batcher = batcher
+        self.metrics = LatencyMetrics()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, _version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                try:
+                    status, payload = await self.route(method, path, body)
+                except Exception as e:
+                    utils.logger.exception("Error handling %s %s", method, path)
+                    status, payload = "500 Internal Server Error", {"ok": False, "error": f"{type(e).__name__}: {e}"}
+                data = json.dumps(payload, default=str).encode()
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(data)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+            utils.logger.warning("Dropping malformed or closed connection: %s", e)
+        finally:
+            writer.close()
+
+    async def route(self, method: str, path: str, body: bytes) -> Tuple[str, dict]:
+        endpoint = path.strip("/").split("?")[0]
+        if method == "GET" and endpoint == "metrics":
+            return "200 OK", self.metrics.summary()
+        if method == "GET" and endpoint == "health":
+            return "200 OK", {"genomes": _STATE["store"].genomes(), "annotations": list(_STATE["annotations"])}
+        if method != "POST" or (endpoint not in HANDLERS and endpoint != "batch"):
+            return "404 Not Found", {"ok": False, "error": f"Unknown endpoint: {method} {path}"}
+        start = time.perf_counter()
+        try:
+            params = json.loads(body or b"{}")
+        except json.JSONDecodeError as e:
+            return "400 Bad Request", {"ok": False, "error": f"Invalid JSON: {e}"}
+        if not isinstance(params, dict):
+            return "400 Bad Request", {"ok": False, "error": "Request body must be a JSON object"}
+        if endpoint == "batch":
+            calls = params.get("requests")
+            if not isinstance(calls, list) or not all(
+                    isinstance(c, dict) and isinstance(c.get("params", {}), dict) for c in calls):
+                return "400 Bad Request", {"ok": False,
+                                           "error": "'requests' must be a list of objects with object 'params'"}
+            results = await asyncio.gather(*(self._call(c.get("op"), c.get("params", {})) for c in calls))
+            response = {"ok": all(r["ok"] for r in results), "results": results}
+        else:
+            response = await self._call(endpoint, params)
+        latency = time.perf_counter() - start
+        self.metrics.record(endpoint, latency, ok=response["ok"])
+        response["latency_ms"] = 1000 * latency
+        utils.logger.debug("%s %s %.1f ms", method, path, 1000 * latency)
+        return ("200 OK" if response["ok"] else "400 Bad Request"), response
+
+    async def _call(self, op: str, params: dict) -> dict:
+        if op not in HANDLERS:
+            return {"ok": False, "error": f"Unknown op: {op}"}
+        start = time.perf_counter()
+        result = await self.batcher.submit(op, params)
+        result["latency_ms"] = 1000 * (time.perf_counter() - start)
+        return result
+
+async def serve(host: str = config.SERVER_HOST, port: int = config.SERVER_PORT, socket_path: Optional[str] = None,
+                workers: int = config.SERVER_WORKERS):
+    """Run the server until cancelled. Call load_state() first so workers inherit the loaded data."""
+    batcher = Batcher(new_executor(workers), workers=workers)
+    app = PanSSRServer(batcher)
+    batch_task = asyncio.create_task(batcher.run())
+    if socket_path:
+        server = await asyncio.start_unix_server(app.handle_connection, path=socket_path)
+        utils.logger.info("PanSSRAtor server listening on unix:%s with %d workers", socket_path, workers)
+    else:
+        server = await asyncio.start_server(app.handle_connection, host, port)
+        utils.logger.info("PanSSRAtor server listening on http://%s:%d with %d workers", host, port, workers)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        batch_task.cancel()
+        batcher.executor.shutdown(cancel_futures=True)
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+if __name__ == '__main__':
+    # Example: serve the genomes in ./genomes/ on the default port.
+    load_state("genomes")
+    asyncio.run(serve())
@@ -0,0 +1,203 @@
+# panssrator/sharding.py
+import os
+import gzip
+import json
+import heapq
+import hashlib
+from typing import List, Dict, Any, Iterator
+from panssrator import config, utils, io_tools, annotator, epcr, marker_filter, contig_pipeline
+
+MANIFEST_VERSION = 2
+
+def config_fingerprint() -> Dict[str, Any]:
+    """Settings that change genome-mode output; every shard must run with the same values."""
+    fingerprint = {
+        "DEFAULT_MIN_REPEATS": config.DEFAULT_MIN_REPEATS,
+        "MAX_SSR_LENGTH": config.MAX_SSR_LENGTH,
+        "PRIMER_PARAMS": config.PRIMER_PARAMS,
+        "FLANK_SIZE": config.FLANK_SIZE,
+        "MAX_EPCR_COST": config.MAX_EPCR_COST,
+        "MAX_EPCR_PRODUCT": config.MAX_EPCR_PRODUCT,
+        "EPCR_BACKEND": epcr.resolve_backend(),
+    }
+    # Round-trip through JSON so it compares equal to the copy stored in the manifest.
+    return json.loads(json.dumps(fingerprint))
+
+def _file_stat(path: str) -> Dict[str, Any]:
+    """Size and mtime of an input file, recorded at plan time to detect later changes."""
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+def plan_shards(genome_dir: str, annot_dir: str, n_shards: int, manifest_path: str) -> Dict[str, Any]:
+    """
+    Split the genome x contig workload into n_shards shards balanced by sequence length
+    and write the shard manifest. Contigs are never split, so a shard is at least as
+    large as its longest contig.
+    """
+    items = []
+    files = {}
+    pairs = io_tools.get_genome_annotation_pairs(genome_dir, annot_dir)
+    for genome_idx, (genome_file, annot_file) in enumerate(pairs):
+        # Shards address contigs by byte offset, so the inputs must not change after planning.
+        for path in (genome_file, annot_file):
+            files[os.path.abspath(path)] = _file_stat(path)
+        for contig_idx, (header, offset, length) in enumerate(io_tools.fasta_index(genome_file)):
+            items.append({"genome": os.path.abspath(genome_file), "annotation": os.path.abspath(annot_file),
+                          "genome_idx": genome_idx, "contig_idx": contig_idx,
+                          "contig": header, "offset": offset, "length": length})
+    n_shards = max(1, min(n_shards, len(items)))
+    # Longest-processing-time-first: give each contig, longest first, to the lightest shard.
+    shards = [{"id": i, "total_length": 0, "items": []} for i in range(n_shards)]
+    heap = [(0, i) for i in range(n_shards)]
+    for item in sorted(items, key=lambda it: (-it["length"], it["genome_idx"], it["contig_idx"])):
+        load, i = heapq.heappop(heap)
+        shards[i]["items"].append(item)
+        shards[i]["total_length"] += item["length"]
+        heapq.heappush(heap, (load + item["length"], i))
+    fingerprint = config_fingerprint()
+    # Shard outputs are tagged with the plan id, so outputs of an older plan are never merged.
+    plan_id = hashlib.sha1(json.dumps([shards, files, fingerprint], sort_keys=True).encode()).hexdigest()
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "plan_id": plan_id,
+        "genome_dir": os.path.abspath(genome_dir),
+        "annot_dir": os.path.abspath(annot_dir),
+        "config": fingerprint,
+        "files": files,
+        "shards": shards,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=1)
+    utils.logger.info("Planned %d contigs into %d shards (%d-%d bp each); manifest saved to %s",
+                      len(items), n_shards, min(s["total_length"] for s in shards),
+                      max(s["total_length"] for s in shards), manifest_path)
+    return manifest
+
+def load_manifest(manifest_path: str) -> Dict[str, Any]:
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        utils.do_error(f"Unsupported shard manifest version: {manifest.get('version')}")
+    return manifest
+
+def shard_output_path(manifest_path: str, shard_id: int) -> str:
+    """Per-shard marker output, stored next to the manifest on shared storage."""
+    base = os.path.splitext(os.path.abspath(manifest_path))[0]
+    return f"{base}.shards/shard_{shard_id:04d}.json.gz"
+
+def _json_record(rec: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    JSON-safe copy of a marker record. Nested values (annotation, primers) are stored in
+    the str() form write_marker_table writes, so the merged TSV is identical to a
+    single-node run; amplicon sizes stay a list for the marker filter.
+    """
+    return {key: value if value is None or isinstance(value, (str, int, float)) or key == "amplicon_sizes"
+            else str(value)
+            for key, value in rec.items()}
+
+def _load_shard_output(path: str, plan_id: str):
+    """Return the shard output if it exists and belongs to this plan, else None."""
+    if not os.path.exists(path):
+        return None
+    with gzip.open(path, "rt") as f:
+        output = json.load(f)
+    return output if output.get("plan_id") == plan_id else None
+
+def run_shard(manifest_path: str, shard_id: int, force: bool = False) -> str:
+    """
+    Process one shard and write its unfiltered marker records. Safe to retry: the output
+    is written atomically and an existing output for the same plan is kept unless force.
+    """
+    manifest = load_manifest(manifest_path)
+    if not 0 <= shard_id < len(manifest["shards"]):
+        utils.do_error(f"Shard {shard_id} not in manifest (0-{len(manifest['shards']) - 1}).")
+    path = shard_output_path(manifest_path, shard_id)
+    if not force and _load_shard_output(path, manifest["plan_id"]) is not None:
+        utils.logger.info("Shard %d already completed: %s", shard_id, path)
+        return path
+    # Use the planned ePCR backend so every node matches primers the same way.
+    config.EPCR_BACKEND = manifest["config"]["EPCR_BACKEND"]
+    if config_fingerprint() != manifest["config"]:
+        utils.do_error("Configuration differs from the one the shard manifest was planned with.")
+    items = manifest["shards"][shard_id]["items"]
+    for input_file in sorted({item["genome"] for item in items} | {item["annotation"] for item in items}):
+        if not os.path.exists(input_file) or _file_stat(input_file) != manifest["files"][input_file]:
+            utils.do_error(f"{input_file} changed since the shard manifest was planned; plan again with --mode plan.")
+
+    annotations = {}
+    results = []
+    for item in items:
+        utils.logger.info("Processing %s contig %s (%d bp)", item["genome"], item["contig"], item["length"])
+        if item["annotation"] not in annotations:
+            annotations[item["annotation"]] = annotator.load_annotation(item["annotation"])
+        header, seq = io_tools.read_fasta_record(item["genome"], item["offset"])
+        if header != item["contig"] or len(seq) != item["length"]:
+            utils.do_error(f"{item['genome']} at offset {item['offset']} is not contig {item['contig']} "
+                           f"({item['length']} bp) from the shard manifest; plan again with --mode plan.")
+        markers = contig_pipeline.process_contig(header, seq, annotations[item["annotation"]],
+                                                 genome=io_tools.genome_name(item["genome"]))
+        results.append((item["genome_idx"], item["contig_idx"], [_json_record(rec) for rec in markers]))
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with gzip.open(tmp_path, "wt") as f:
+        json.dump({"plan_id": manifest["plan_id"], "shard_id": shard_id, "results": results}, f)
+    os.replace(tmp_path, path)
+    utils.logger.info("Shard %d markers saved to %s", shard_id, path)
+    return path
+
+def iter_shard_markers(manifest_path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the unfiltered marker records of all shards, holding one shard in memory at a
+    time. Record order is not the single-node order. Fails, like merge_shards, if any
+    shard is not completed.
+    """
+    manifest = load_manifest(manifest_path)
+    # Cheap existence check first, so a run with missing shards fails before reading any.
+    missing = [shard["id"] for shard in manifest["shards"]
+               if not os.path.exists(shard_output_path(manifest_path, shard["id"]))]
+    if missing:
+        utils.do_error(f"Shards not completed (re-run them with --mode run-shard): {missing}")
+    for shard in manifest["shards"]:
+        shard_output = _load_shard_output(shard_output_path(manifest_path, shard["id"]), manifest["plan_id"])
+        if shard_output is None:
+            utils.do_error(f"Shard {shard['id']} output is from another plan (re-run it with --mode run-shard)")
+        for _genome_idx, _contig_idx, markers in shard_output["results"]:
+            yield from markers
+
+def merge_shards(manifest_path: str, output: str) -> List[Dict[str, Any]]:
+    """
+    Combine all shard outputs in single-node order (genome, then contig), apply the
+    cross-genome marker filter and write the final marker TSV.
+    """
+    manifest = load_manifest(manifest_path)
+    outputs = {}
+    missing = []
+    for shard in manifest["shards"]:
+        shard_output = _load_shard_output(shard_output_path(manifest_path, shard["id"]), manifest["plan_id"])
+        if shard_output is None:
+            missing.append(shard["id"])
+        else:
+            outputs[shard["id"]] = shard_output
+    if missing:
+        utils.do_error(f"Shards not completed (re-run them with --mode run-shard): {missing}")
+    per_contig = {}
+    for shard_output in outputs.values():
+        for genome_idx, contig_idx, markers in shard_output["results"]:
+            per_contig[(genome_idx, contig_idx)] = markers
+    all_markers = []
+    for key in sorted(per_contig):
+        all_markers.extend(per_contig[key])
+    filtered_markers = marker_filter.filter_markers(all_markers)
+    utils.logger.info("Total markers detected: %d; Filtered markers: %d", len(all_markers), len(filtered_markers))
+    io_tools.write_marker_table(output, filtered_markers)
+    utils.logger.info("Marker database saved to %s", output)
+    return filtered_markers
+
+if __name__ == '__main__':
+    # Example: plan two shards over ./genomes/ and ./annotations/, run them and merge.
+    plan_shards("genomes", "annotations", 2, "shards.json")
+    for i in range(2):
+        run_shard("shards.json", i)
+    merge_shards("shards.json", "markers.tsv")
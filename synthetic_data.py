@@ -0,0 +1,217 @@
+# panssrator/synthetic_data.py
+import os
+import random
+from typing import List, Dict, Any
+from panssrator import config, utils, backends
+
+# Relative frequency of SSR motif lengths (di- and trinucleotides dominate in most plant genomes)
+MOTIF_LENGTH_WEIGHTS = {1: 0.15, 2: 0.35, 3: 0.30, 4: 0.10, 5: 0.05, 6: 0.05}
+MOTIF_CLASSES = {1: "mono", 2: "di", 3: "tri", 4: "tetra", 5: "penta", 6: "hexa"}
+
+# Repeat-count differences between genomes/alleles at a planted SSR
+ALLELE_SHIFTS = [-2, -1, 0, 0, 1, 2]
+
+def random_sequence(rng: random.Random, length: int) -> str:
+    return "".join(rng.choices("ACGT", k=length))
+
+def _random_motif(rng: random.Random, motif_length: int) -> str:
+    """Draw a motif that is not itself a repeat of a shorter unit (e.g. no 'ATAT' or 'CCC')."""
+    while True:
+        motif = random_sequence(rng, motif_length)
+        if not any(motif_length % k == 0 and motif == motif[:k] * (motif_length // k)
+                   for k in range(1, motif_length)):
+            return motif
+
+def _plant_sites(rng: random.Random, contig_length: int, ssr_density: float) -> List[Dict[str, Any]]:
+    """Choose evenly spread SSR sites (motif, base repeat count, background offset) on a contig."""
+    n_sites = int(contig_length / 1e6 * ssr_density)
+    if n_sites == 0:
+        return []
+    spacing = contig_length // n_sites
+    # Keep sites far enough apart for primer flanks and the compound-SSR distance.
+    jitter = max(0, spacing // 2 - config.FLANK_SIZE - config.MIN_FLANK_BETWEEN_SSR)
+    sites = []
+    for i in range(n_sites):
+        motif_length = rng.choices(list(MOTIF_LENGTH_WEIGHTS), weights=list(MOTIF_LENGTH_WEIGHTS.values()))[0]
+        min_rep = config.DEFAULT_MIN_REPEATS[MOTIF_CLASSES[motif_length]]
+        # Leave room for allele shifts in both directions without leaving the detectable range.
+        low = min_rep - min(ALLELE_SHIFTS)
+        high = max(low, min(low + 8, config.MAX_SSR_LENGTH // motif_length - max(ALLELE_SHIFTS)))
+        sites.append({
+            "offset": i * spacing + spacing // 2 + rng.randint(-jitter, jitter),
+            "motif": _random_motif(rng, motif_length),
+            "repeat_count": rng.randint(low, high),
+        })
+    return sites
+
+def _build_contig(background: str, sites: List[Dict[str, Any]], repeat_counts: List[int]):
+    """Insert SSRs into a background sequence; returns the sequence and 1-indexed SSR records."""
+    parts = []
+    records = []
+    pos = 0
+    length = 0
+    for site, repeat_count in zip(sites, repeat_counts):
+        parts.append(background[pos:site["offset"]])
+        length += site["offset"] - pos
+        ssr = site["motif"] * repeat_count
+        records.append({"start": length + 1, "end": length + len(ssr), "motif": site["motif"],
+                        "repeat_count": repeat_count})
+        parts.append(ssr)
+        length += len(ssr)
+        pos = site["offset"]
+    parts.append(background[pos:])
+    return "".join(parts), records
+
+def _write_fasta(path: str, contigs: Dict[str, str], width: int = 60):
+    with open(path, "w") as f:
+        for header, seq in contigs.items():
+            f.write(f">{header}\n")
+            for i in range(0, len(seq), width):
+                f.write(seq[i:i + width] + "\n")
+
+def _write_gff(path: str, rng: random.Random, contig_lengths: Dict[str, int], gene_density: float) -> int:
+    """Write genes with mRNA/exon/CDS children at gene_density genes per Mb; returns the feature count."""
+    n_features = 0
+    with open(path, "w") as f:
+        f.write("##gff-version 3\n")
+        for chrom, length in contig_lengths.items():
+            n_genes = int(length / 1e6 * gene_density)
+            spacing = length // n_genes if n_genes else length
+            for g in range(n_genes):
+                gene_start = g * spacing + rng.randint(1, max(1, spacing // 4))
+                gene_end = min(length, gene_start + rng.randint(1000, max(1000, spacing // 2)))
+                strand = rng.choice("+-")
+                gene_id = f"{chrom}_g{g}"
+                rows = [("gene", gene_start, gene_end, f"ID={gene_id}"),
+                        ("mRNA", gene_start, gene_end, f"ID={gene_id}.t1;Parent={gene_id}")]
+                # Split the gene into alternating exons and introns.
+                n_exons = rng.randint(1, 5)
+                step = (gene_end - gene_start + 1) // (2 * n_exons - 1)
+                for e in range(n_exons):
+                    exon_start = gene_start + 2 * e * step
+                    exon_end = exon_start + step - 1
+                    rows.append(("exon", exon_start, exon_end, f"Parent={gene_id}.t1"))
+                    rows.append(("CDS", exon_start, exon_end, f"Parent={gene_id}.t1"))
+                for ftype, start, end, attributes in rows:
+                    f.write(f"{chrom}\tsynthetic\t{ftype}\t{start}\t{end}\t.\t{strand}\t.\t{attributes}\n")
+                n_features += len(rows)
+    return n_features
+
+@utils.timeit
+def generate_pangenome(out_dir: str, n_genomes: int = 2, genome_size: int = 1_000_000, n_contigs: int = 2,
+                       ssr_density: float = 150, gene_density: float = 40, seed: int = 1) -> Dict[str, Any]:
+    """
+    Write a deterministic synthetic pan-genome: n_genomes FASTAs sharing a random background
+    with SSRs planted at ssr_density per Mb (repeat counts varying between genomes) and a
+    matching GFF per genome.
+
+    Returns a dictionary with 'genome_dir', 'annot_dir' and 'genomes', mapping each genome
+    name to its 'fasta', 'gff', 'n_features', 'contig_lengths' and planted 'ssrs' (records
+    with 'chrom', 'start', 'end', 'motif' and 'repeat_count', as produced by genome mode).
+    """
+    rng = random.Random(seed)
+    genome_dir = os.path.join(out_dir, "genomes")
+    annot_dir = os.path.join(out_dir, "annotations")
+    os.makedirs(genome_dir, exist_ok=True)
+    os.makedirs(annot_dir, exist_ok=True)
+    contig_length = genome_size // n_contigs
+    backgrounds = {f"chr{c + 1}": random_sequence(rng, contig_length) for c in range(n_contigs)}
+    sites = {chrom: _plant_sites(rng, contig_length, ssr_density) for chrom in backgrounds}
+
+    genomes = {}
+    for g in range(n_genomes):
+        # Zero-padded so no genome name is a prefix of another (annotation pairing matches by substring).
+        name = f"synth_{g:02d}"
+        contigs = {}
+        ssrs = []
+        for chrom, background in backgrounds.items():
+            repeat_counts = [s["repeat_count"] + (rng.choice(ALLELE_SHIFTS) if g else 0) for s in sites[chrom]]
+            seq, records = _build_contig(background, sites[chrom], repeat_counts)
+            contigs[chrom] = seq
+            for rec in records:
+                rec["chrom"] = chrom
+            ssrs.extend(records)
+        fasta = os.path.join(genome_dir, f"{name}.fa")
+        gff = os.path.join(annot_dir, f"{name}.gff")
+        contig_lengths = {chrom: len(seq) for chrom, seq in contigs.items()}
+        _write_fasta(fasta, contigs)
+        n_features = _write_gff(gff, rng, contig_lengths, gene_density)
+        genomes[name] = {"fasta": fasta, "gff": gff, "n_features": n_features,
+                         "contig_lengths": contig_lengths, "ssrs": ssrs}
+    return {"genome_dir": genome_dir, "annot_dir": annot_dir, "genomes": genomes}
+
+def write_markers(path: str, ssrs: List[Dict[str, Any]]):
+    """Write SSR records as a marker TSV readable by io_tools.load_markers."""
+    with open(path, "w") as f:
+        f.write("\t".join(["chrom", "start", "end", "motif", "repeat_count"]) + "\n")
+        for rec in ssrs:
+            f.write(f"{rec['chrom']}\t{rec['start']}\t{rec['end']}\t{rec['motif']}\t{rec['repeat_count']}\n")
+
+@utils.timeit
+def simulate_bams(out_dir: str, contigs: Dict[str, str], markers: List[Dict[str, Any]], n_samples: int = 2,
+                  coverage: int = 20, read_length: int = 150, low_mapq_fraction: float = 0.1,
+                  seed: int = 1) -> Dict[str, Dict[tuple, List[int]]]:
+    """
+    Write coordinate-sorted, indexed BAMs of reads spanning each marker, with a known
+    diploid genotype per sample and marker. About low_mapq_fraction of the reads get
+    MAPQ 20 so that MAPQ filtering is exercised.
+
+    Returns the truth set: BAM path -> (marker chrom, marker start) -> sorted list of two
+    allele repeat counts.
+    """
+    pysam = backends.load("pysam")
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    header = {"HD": {"VN": "1.6", "SO": "coordinate"},
+              "SQ": [{"SN": chrom, "LN": len(seq)} for chrom, seq in contigs.items()]}
+    chrom_ids = {chrom: i for i, chrom in enumerate(contigs)}
+    truth = {}
+    for s in range(n_samples):
+        path = os.path.join(out_dir, f"sample_{s:02d}.bam")
+        truth[path] = {}
+        reads = []
+        for m, marker in enumerate(markers):
+            ref = contigs[marker["chrom"]]
+            motif = marker["motif"]
+            ref_len = marker["end"] - marker["start"] + 1
+            alleles = sorted(max(1, marker["repeat_count"] + rng.choice(ALLELE_SHIFTS)) for _ in range(2))
+            truth[path][(marker["chrom"], marker["start"])] = alleles
+            for r in range(coverage):
+                allele_len = alleles[r % 2] * len(motif)
+                # Place the read so it spans the SSR with at least one flanking base on each side.
+                min_left = max(1, read_length - allele_len - (len(ref) - marker["end"]))
+                max_left = min(read_length - allele_len - 1, marker["start"] - 1)
+                if min_left > max_left:
+                    continue
+                left = rng.randint(min_left, max_left)
+                right = read_length - allele_len - left
+                ref_start = marker["start"] - 1 - left
+                seq = ref[ref_start:marker["start"] - 1] + motif * alleles[r % 2] + ref[marker["end"]:marker["end"] + right]
+                cigar = [(0, left)]
+                if allele_len >= ref_len:
+                    cigar += [(0, ref_len), (1, allele_len - ref_len)]
+                else:
+                    cigar += [(0, allele_len), (2, ref_len - allele_len)]
+                cigar.append((0, right))
+                read = pysam.AlignedSegment()
+                read.query_name = f"m{m}_r{r}"
+                read.query_sequence = seq
+                read.reference_id = chrom_ids[marker["chrom"]]
+                read.reference_start = ref_start
+                read.cigartuples = [op for op in cigar if op[1] > 0]
+                read.mapping_quality = 20 if rng.random() < low_mapq_fraction else 60
+                read.is_reverse = bool(r % 2)
+                read.query_qualities = pysam.qualitystring_to_array("I" * len(seq))
+                reads.append(read)
+        reads.sort(key=lambda read: (read.reference_id, read.reference_start))
+        with pysam.AlignmentFile(path, "wb", header=header) as bam:
+            for read in reads:
+                bam.write(read)
+        pysam.index(path)
+    return truth
+
+if __name__ == '__main__':
+    # Example: a small two-genome pan-genome in ./synthetic/
+    data = generate_pangenome("synthetic", genome_size=200_000)
+    for name, genome in data["genomes"].items():
+        utils.logger.info("%s: %d SSRs, %d annotation features", name, len(genome["ssrs"]), genome["n_features"])